@@ -1,12 +1,14 @@
+import os
+import tempfile
+import time
+
 import streamlit as st
-import numpy as np
-import pandas as pd
-import joblib
-import pickle
-import matplotlib.pyplot as plt
-import seaborn as sns
 from streamlit_option_menu import option_menu
-from mistralai.client import MistralClient
+
+import metrics
+
+# Les dépendances lourdes (numpy, sklearn, matplotlib, pandas, mistralai) sont
+# importées dans la page qui en a besoin : Accueil et A Propos n'en chargent aucune.
 
 # Configuration de la page
 st.set_page_config(
@@ -97,6 +99,49 @@ class MultiApp:
             unsafe_allow_html=True
         )
 
+    @staticmethod
+    def admin_enabled():
+        # Panneau réservé au déploiement : un paramètre d'URL l'ouvrirait à tout visiteur
+        return os.environ.get("PREDCULTURE_ADMIN") == "1"
+
+    @staticmethod
+    def drift_monitor():
+        # Le module n'est importé que si des prédictions ont déjà chargé numpy
+        import sys
+
+        drift = sys.modules.get("drift")
+        return drift.current_drift_monitor() if drift else None
+
+    @staticmethod
+    def admin_panel():
+        with st.expander("⚙️ Administration"):
+            st.markdown("**Durée des étapes**")
+            st.dataframe(metrics.REGISTRY.summary(), hide_index=True, width="stretch")
+            gauges = metrics.REGISTRY.gauges()
+            if gauges:
+                st.markdown("**Caches**")
+                st.dataframe(
+                    [{"cache": name, "stat": key, "valeur": value} for (name, key), value in sorted(gauges.items())],
+                    hide_index=True, width="stretch"
+                )
+            monitor = MultiApp.drift_monitor()
+            if monitor is not None and monitor.rows:
+                from drift import MIN_ROWS, PSI_ALERT, PSI_WARNING
+
+                scores = monitor.scores()
+                enough = scores["rows"] >= MIN_ROWS
+                st.markdown(f"**Dérive des entrées** ({scores['rows']} lignes depuis le démarrage)")
+                rows = sorted(scores["features"] + scores["components"], key=lambda r: -r["psi"])
+                st.dataframe(
+                    [{"": "⚪" if not enough else
+                          "🔴" if r["psi"] >= PSI_ALERT else "🟠" if r["psi"] >= PSI_WARNING else "🟢",
+                      "variable": r["name"], "PSI": round(r["psi"], 3), "KS": round(r["ks"], 3),
+                      "écart moyen (σ)": round(r["mean_shift_std"], 2)} for r in rows],
+                    hide_index=True, width="stretch"
+                )
+            st.download_button("Exporter (Prometheus)", metrics.render_prometheus(),
+                               file_name="metrics.txt", width="stretch")
+
     def run(self):
         MultiApp.add_bg_from_url()
 
@@ -134,6 +179,9 @@ class MultiApp:
                     },
                 }
             )
+            
+            if MultiApp.admin_enabled():
+                MultiApp.admin_panel()
 
         if app == 'Accueil':
             st.markdown('<h1 class="main-title">PRedCulture</h1>', unsafe_allow_html=True)
@@ -145,7 +193,7 @@ class MultiApp:
                 </div>
             """, unsafe_allow_html=True)
             
-            st.image(HERO_IMAGE, use_column_width=True, caption="Technologie au service de la santé")
+            st.image(HERO_IMAGE, width="stretch", caption="Technologie au service de la santé")
             st.markdown("------")
     
             # Section des fonctionnalités
@@ -181,7 +229,7 @@ class MultiApp:
                             <p style="color: #555;">{feature['desc']}</p>
                         </div>
                         """, unsafe_allow_html=True)
-                        st.image(FEATURE_IMAGES[i], use_column_width=True, caption=feature['title'])
+                        st.image(FEATURE_IMAGES[i], width="stretch", caption=feature['title'])
             
             st.markdown("------")
             
@@ -225,33 +273,36 @@ class MultiApp:
             """, unsafe_allow_html=True)
             
         if app == 'Analyse':
+            import numpy as np
+
+            from audit import get_audit_log
+            from drift import get_drift_monitor
+            from explain import get_explainer
+            from features import FEATURE_COLUMNS, MALIGNANT_CLASS
+            from inference import get_pipeline, get_prediction_memo
+            from rendering import result_chart_png
+            from validation import get_validator
+
             st.markdown('<h1 class="main-title">Analyse Prédictive</h1>', unsafe_allow_html=True)
             
-            tab1, tab2 = st.tabs([
+            tab1, tab2, tab3 = st.tabs([
                 "🔬 Prediction par éléments chimiques", 
-                "💬 Assistant Virtuel"
+                "💬 Assistant Virtuel",
+                "📂 Analyse par lot"
             ])
             
             with tab1:
                 with st.container():
                     st.subheader("Entrez les paramètres biologiques", divider='blue')
                     
-                    # Chargement des objets
-                    model = pickle.load(open("Model.pkl", "rb"))
-                    scaler = joblib.load("scaler.pkl")
-                    pca = joblib.load("pca.pkl")
+                    # Chargement du pipeline compilé (une seule fois par processus)
+                    pipeline = get_pipeline()
                     
                     # Les 30 colonnes dans l'ordre
-                    columns = [
-                        "radius_mean", "texture_mean", "perimeter_mean", "area_mean", "smoothness_mean",
-                        "compactness_mean", "concavity_mean", "concave points_mean", "symmetry_mean", "fractal_dimension_mean",
-                        "radius_se", "texture_se", "perimeter_se", "area_se", "smoothness_se",
-                        "compactness_se", "concavity_se", "concave points_se", "symmetry_se", "fractal_dimension_se",
-                        "radius_worst", "texture_worst", "perimeter_worst", "area_worst", "smoothness_worst",
-                        "compactness_worst", "concavity_worst", "concave points_worst", "symmetry_worst", "fractal_dimension_worst"
-                    ]
+                    columns = FEATURE_COLUMNS
                     
                     # Formulaire d'entrée utilisateur avec des colonnes
+                    form_start = time.perf_counter()
                     user_input = []
                     with st.form("input_form"):
                         cols = st.columns(3)
@@ -266,47 +317,117 @@ class MultiApp:
                                 )
                                 user_input.append(val)
                         
-                        submitted = st.form_submit_button("Lancer l'analyse", use_container_width=True)
+                        submitted = st.form_submit_button("Lancer l'analyse", width="stretch")
+                    metrics.observe("form", time.perf_counter() - form_start)
                     
                     if submitted:
                         with st.spinner('Analyse en cours...'):
                             try:
                                 # Convertir en array numpy
                                 input_array = np.array(user_input).reshape(1, -1)
+                                started = time.perf_counter()
+                                audit_log = get_audit_log()
                         
-                                # Transformation scaler + PCA
-                                input_scaled = scaler.transform(input_array)
-                                input_pca = pca.transform(input_scaled)
+                                # Contrôle des plages d'entraînement avant toute inférence
+                                report = get_validator().validate(input_array)
+                                if report.n_rejected:
+                                    if audit_log is not None:
+                                        audit_log.record(input_array, np.nan, -1, pipeline.version,
+                                                         time.perf_counter() - started, "form", report.status)
+                                    st.error("**Saisie rejetée** : valeurs hors de toute plage plausible.\n\n"
+                                             + "\n".join(f"- {m}" for m in report.describe(0)))
+                                else:
+                                    if report.n_out_of_range:
+                                        st.warning("**Valeurs hors des plages d'entraînement** : "
+                                                   "le résultat est à interpréter avec prudence.\n\n"
+                                                   + "\n".join(f"- {m}" for m in report.describe(0)))
                         
-                                # Prédiction
-                                prediction = model.predict(input_pca)[0]
+                                    # Transformation scaler + PCA et prédiction en une passe,
+                                    # mémoïsée pour les saisies déjà analysées
+                                    proba = get_prediction_memo().predict_proba(pipeline, input_array)
+                                    prediction = pipeline.classes[np.argmax(proba[0])]
+                                    malignant = int(np.flatnonzero(pipeline.classes == MALIGNANT_CLASS)[0])
+                                    if audit_log is not None:
+                                        # Simple ajout en file : l'écriture Parquet se fait en arrière-plan
+                                        audit_log.record(input_array, proba[:, malignant], prediction, pipeline.version,
+                                                         time.perf_counter() - started, "form", report.status)
                         
-                                # Affichage des résultats
-                                with st.container():
-                                    st.markdown("### Résultats de l'analyse")
-                                    if prediction == 1:
-                                        st.error("""
-                                        **Résultat : Tumeur Maligne**  
-                                        🔴 Une intervention médicale est recommandée.
-                                        """)
-                                    else:
-                                        st.success("""
-                                        **Résultat : Tumeur Bénigne**  
-                                        🟢 Aucun signe de malignité détecté.
-                                        """)
+                                    # Affichage des résultats
+                                    with st.container():
+                                        st.markdown("### Résultats de l'analyse")
+                                        if prediction == 1:
+                                            st.error("""
+                                            **Résultat : Tumeur Maligne**  
+                                            🔴 Une intervention médicale est recommandée.
+                                            """)
+                                        else:
+                                            st.success("""
+                                            **Résultat : Tumeur Bénigne**  
+                                            🟢 Aucun signe de malignité détecté.
+                                            """)
                                     
-                                    # Graphique explicatif
-                                    fig, ax = plt.subplots(figsize=(8, 4))
-                                    ax.barh(['Résultat'], [1], color=['#4CAF50' if prediction == 0 else '#F44336'])
-                                    ax.set_xlim(0, 1)
-                                    ax.set_xticks([])
-                                    ax.text(0.5, 0, 'Bénin' if prediction == 0 else 'Malin', 
-                                            ha='center', va='center', color='white', fontsize=12)
-                                    st.pyplot(fig)
+                                        # Graphique explicatif (image mise en cache par classe)
+                                        with metrics.timed("render"):
+                                            st.image(result_chart_png(bool(prediction == 1)), width="stretch")
+                                    
+                                        # Probabilité servie (mémo) et contributions, sans nouvel appel au modèle
+                                        explanation = get_explainer(pipeline).contributions(input_array)
+                                        st.metric("Probabilité de malignité", f"{proba[0, malignant]:.1%}")
+                                        top = np.argsort(-np.abs(explanation.contributions[0]))[:10]
+                                        st.markdown("#### Caractéristiques les plus influentes")
+                                        st.bar_chart(
+                                            {"contribution": {FEATURE_COLUMNS[i]: float(explanation.contributions[0, i]) for i in top}},
+                                            horizontal=True,
+                                        )
+                                        st.caption(f"Écart à la probabilité moyenne d'entraînement ({explanation.baseline:.1%}) : "
+                                                   "une valeur positive rapproche du diagnostic malin.")
+                                
+                                    # Résumés de dérive mis à jour après l'affichage du résultat
+                                    get_drift_monitor(pipeline).update(input_array)
                                     
                             except Exception as e:
                                 st.error(f"Une erreur est survenue : {str(e)}")
             
+            with tab3:
+                st.subheader("Analyse d'une cohorte de patients", divider='blue')
+                st.info("""
+                📂 Chargez un fichier CSV ou Parquet contenant les 30 colonnes de `wisc_bc_data.csv`
+                (`radius_mean` … `fractal_dimension_worst`). Le fichier est analysé par blocs.
+                """)
+                
+                uploaded = st.file_uploader("Fichier de patients", type=["csv", "parquet"])
+                with_contributions = st.checkbox("Inclure les contributions des 30 caractéristiques")
+                if uploaded is not None and st.button("Analyser le fichier", width="stretch"):
+                    with st.spinner('Analyse du lot en cours...'):
+                        result_path = None
+                        try:
+                            from batch import score_file
+
+                            # Les résultats sont écrits sur disque au fil des blocs
+                            out_format = "parquet" if uploaded.name.lower().endswith(".parquet") else "csv"
+                            with tempfile.NamedTemporaryFile(suffix=f".{out_format}", delete=False) as tmp:
+                                result_path = tmp.name
+                            summary = score_file(uploaded, result_path, explain=with_contributions)
+                            
+                            st.success(f"{summary['rows']} patients analysés, "
+                                       f"dont {summary['malignant']} tumeurs malignes.")
+                            if summary["out_of_range"] or summary["rejected"]:
+                                st.warning(f"{summary['out_of_range']} patients hors des plages d'entraînement, "
+                                           f"{summary['rejected']} lignes rejetées (sans prédiction).")
+                            with open(result_path, "rb") as f:
+                                st.download_button(
+                                    "Télécharger les résultats",
+                                    data=f,
+                                    file_name=f"predictions.{out_format}",
+                                    width="stretch"
+                                )
+                        except Exception as e:
+                            st.error(f"Une erreur est survenue : {str(e)}")
+                        finally:
+                            # Le fichier temporaire est supprimé même si l'analyse échoue
+                            if result_path is not None and os.path.exists(result_path):
+                                os.remove(result_path)
+            
             with tab2:
                 st.subheader("Assistant Virtuel PRedCulture", divider='blue')
                 st.info("""
@@ -314,42 +435,44 @@ class MultiApp:
                 Notre assistant IA vous répondra en temps réel.
                 """)
                 
-                # Initialisation du client Mistral
-                client = MistralClient(api_key='1vR1v62cvbW5KgQVfHmR1jn5IdJGIt6j')
+                # Client Mistral partagé par toutes les sessions du processus
+                from assistant import MissingApiKeyError, get_backend
+
+                try:
+                    backend = get_backend()
+                except MissingApiKeyError as e:
+                    backend = None
+                    st.error(str(e))
                 
-                # Initialiser l'historique des messages
-                if 'messages' not in st.session_state:
-                    st.session_state.messages = [
-                        {"role": "assistant", "content": "Bonjour ! Je suis votre assistant PRedCulture. Comment puis-je vous aider concernant le cancer du sein ?"}
-                    ]
+                if backend is not None:
+                    # Initialiser l'historique des messages
+                    if 'messages' not in st.session_state:
+                        st.session_state.messages = [
+                            {"role": "assistant", "content": "Bonjour ! Je suis votre assistant PRedCulture. Comment puis-je vous aider concernant le cancer du sein ?"}
+                        ]
                 
-                # Afficher l'historique des messages
-                for msg in st.session_state.messages:
-                    with st.chat_message(msg["role"]):
-                        st.markdown(msg["content"])
+                    # Afficher l'historique des messages
+                    for msg in st.session_state.messages:
+                        with st.chat_message(msg["role"]):
+                            st.markdown(msg["content"])
                 
-                # Gestion de l'interaction utilisateur
-                if prompt := st.chat_input("Écrivez votre question ici..."):
-                    # Ajouter le message utilisateur
-                    st.session_state.messages.append({"role": "user", "content": prompt})
-                    with st.chat_message("user"):
-                        st.markdown(prompt)
+                    # Gestion de l'interaction utilisateur
+                    if prompt := st.chat_input("Écrivez votre question ici..."):
+                        # Ajouter le message utilisateur
+                        st.session_state.messages.append({"role": "user", "content": prompt})
+                        with st.chat_message("user"):
+                            st.markdown(prompt)
                     
-                    # Générer la réponse
-                    with st.spinner("L'assistant réfléchit..."):
-                        try:
-                            chat_response = client.chat(
-                                model="mistral-tiny",
-                                messages=[{"role": m["role"], "content": m["content"]} for m in st.session_state.messages]
-                            )
-                            response = chat_response.choices[0].message.content
-                        except Exception as e:
-                            response = f"Désolé, une erreur s'est produite : {str(e)}"
+                        # Générer et afficher la réponse au fil des jetons
+                        with st.chat_message("assistant"):
+                            try:
+                                response = st.write_stream(backend.stream(st.session_state.messages))
+                            except Exception as e:
+                                response = f"Désolé, une erreur s'est produite : {str(e)}"
+                                st.markdown(response)
                     
-                    # Ajouter et afficher la réponse
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    with st.chat_message("assistant"):
-                        st.markdown(response)
+                        # Ajouter la réponse à l'historique
+                        st.session_state.messages.append({"role": "assistant", "content": response})
 
         elif app == 'A Propos':
             st.markdown('<h1 class="main-title">À Propos de PRedCulture</h1>', unsafe_allow_html=True)
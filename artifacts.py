@@ -0,0 +1,185 @@
+"""Registre des artefacts du modèle (modèle, scaler, PCA) partagé par processus.
+
+Les fichiers sont chargés une seule fois puis partagés entre toutes les sessions
+Streamlit du processus. Ils ne sont rechargés que si leur date de modification
+ou leur empreinte change.
+
+Si un manifest.json accompagne les fichiers (``train.py --install``), seul un
+jeu dont les empreintes correspondent toutes au manifeste est chargé : pendant
+une installation, le registre continue de servir le jeu précédent.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from metrics import timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_FILE = "model.pkl"
+SCALER_FILE = "scaler.pkl"
+PCA_FILE = "pca.pkl"
+ARTIFACT_FILES = (MODEL_FILE, SCALER_FILE, PCA_FILE)
+MANIFEST_FILE = "manifest.json"
+# Attente maximale d'un jeu cohérent au premier chargement (installation en cours)
+INSTALL_WAIT = 10.0
+
+
+@dataclass(frozen=True)
+class Artifacts:
+    model: object
+    scaler: object
+    pca: object
+    # Empreinte combinée des trois fichiers, utilisée comme version du modèle
+    version: str
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifacts_version(digests):
+    """Version du modèle dérivée des empreintes des trois fichiers (``{nom: sha256}``)."""
+    return hashlib.sha256("".join(digests[name] for name in ARTIFACT_FILES).encode()).hexdigest()[:16]
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class ArtifactRegistry:
+    """Charge les artefacts une fois et les recharge uniquement s'ils changent.
+
+    ``mmap_mode`` est transmis à ``joblib.load`` pour le scaler et la PCA afin
+    de projeter en mémoire les grands tableaux numpy au lieu de les copier.
+    """
+
+    def __init__(self, base_dir=BASE_DIR, mmap_mode=None):
+        self.base_dir = base_dir
+        self.mmap_mode = mmap_mode
+        self._lock = threading.Lock()
+        self._artifacts = None
+        self._stats = {}
+        self._digests = {}
+        self.load_count = 0
+
+    def path(self, name):
+        return os.path.join(self.base_dir, name)
+
+    def _load_file(self, name):
+        import joblib
+
+        path = self.path(name)
+        if name == MODEL_FILE:
+            # model.pkl est un pickle standard, sans tableaux joblib à projeter
+            import pickle
+
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        return joblib.load(path, mmap_mode=self.mmap_mode)
+
+    def _changed_files(self):
+        # Un stat() par fichier : la vérification reste négligeable à chaque rerun
+        changed = []
+        for name in ARTIFACT_FILES:
+            key = _stat_key(self.path(name))
+            if self._stats.get(name) != key:
+                changed.append((name, key))
+        return changed
+
+    def _manifest_digests(self):
+        # Empreintes annoncées par le manifeste, None sans manifeste
+        try:
+            with open(self.path(MANIFEST_FILE)) as f:
+                files = json.load(f).get("files", {})
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # Manifeste en cours de remplacement : jeu considéré incohérent
+            return {}
+        return {name: files.get(name) for name in ARTIFACT_FILES}
+
+    def _reload(self, changed):
+        """Charge les fichiers modifiés ; None si le jeu ne correspond pas au manifeste."""
+        digests = dict(self._digests)
+        for name, _ in changed:
+            digests[name] = file_digest(self.path(name))
+        expected = self._manifest_digests()
+        if expected is not None and any(digests.get(name) != expected[name] for name in ARTIFACT_FILES):
+            return None
+
+        loaded = {}
+        for name, _ in changed:
+            if self._artifacts is not None and self._digests.get(name) == digests[name]:
+                # Fichier simplement touché : le contenu est identique
+                continue
+            with timed("artifact_load"):
+                loaded[name] = self._load_file(name)
+        # Fichier remplacé entre l'empreinte et la lecture : on recommencera
+        if any(_stat_key(self.path(name)) != key for name, key in changed):
+            return None
+
+        self._stats.update(changed)
+        self._digests = digests
+        if not loaded and self._artifacts is not None:
+            return self._artifacts
+
+        current = self._artifacts
+        version = artifacts_version(self._digests)
+        self._artifacts = Artifacts(
+            model=loaded.get(MODEL_FILE, current and current.model),
+            scaler=loaded.get(SCALER_FILE, current and current.scaler),
+            pca=loaded.get(PCA_FILE, current and current.pca),
+            version=version,
+        )
+        self.load_count += 1
+        return self._artifacts
+
+    def get(self):
+        changed = self._changed_files()
+        if not changed and self._artifacts is not None:
+            return self._artifacts
+
+        with self._lock:
+            deadline = time.monotonic() + INSTALL_WAIT
+            while True:
+                # Un autre thread a pu recharger pendant l'attente du verrou
+                changed = self._changed_files()
+                if not changed and self._artifacts is not None:
+                    return self._artifacts
+                artifacts = self._reload(changed)
+                if artifacts is not None:
+                    return artifacts
+                if self._artifacts is not None:
+                    # Installation en cours : le jeu précédent reste servi
+                    return self._artifacts
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Les artefacts de {self.base_dir} ne correspondent pas à {MANIFEST_FILE}")
+                time.sleep(0.1)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ArtifactRegistry(
+                    mmap_mode=os.environ.get("PREDCULTURE_MMAP_MODE") or None
+                )
+    return _registry
+
+
+def load_artifacts():
+    return get_registry().get()
@@ -0,0 +1,193 @@
+"""Backend de l'assistant virtuel : client Mistral partagé et réponses en flux.
+
+Un seul client asynchrone (et son pool de connexions) est créé par processus.
+Il tourne sur une boucle asyncio dédiée, dans un thread de fond : chaque
+session Streamlit y soumet sa requête et lit les jetons au fil de l'eau, sans
+bloquer les autres sessions pendant qu'une réponse lente est générée.
+
+Les réponses sont mises en cache selon la question normalisée et un court
+contexte : une question fréquente revient en quelques millisecondes, sans
+appel distant. ``PREDCULTURE_CHAT_CACHE_DB`` conserve ce cache sur disque.
+
+La clé est lue dans ``MISTRAL_API_KEY``, sans valeur par défaut.
+``MISTRAL_ENDPOINT`` permet de viser un serveur local (voir chat_stub.py).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+
+from caching import LRUCache, SqliteBackend
+from metrics import observe, register_collector
+
+MODEL = "mistral-tiny"
+API_KEY = os.environ.get("MISTRAL_API_KEY")
+ENDPOINT = os.environ.get("MISTRAL_ENDPOINT", "https://api.mistral.ai")
+
+# Budget de l'historique envoyé au modèle, en jetons estimés
+HISTORY_TOKEN_BUDGET = int(os.environ.get("PREDCULTURE_HISTORY_TOKENS", 2000))
+# Délai maximal sans nouveau jeton avant d'abandonner la réponse (s)
+STREAM_TIMEOUT = 120
+
+# Cache des réponses : taille, durée de vie et messages de contexte dans la clé
+CACHE_SIZE = int(os.environ.get("PREDCULTURE_CHAT_CACHE_SIZE", 1024))
+CACHE_TTL = float(os.environ.get("PREDCULTURE_CHAT_CACHE_TTL", 24 * 3600))
+CACHE_CONTEXT_MESSAGES = 2
+CACHE_DB = os.environ.get("PREDCULTURE_CHAT_CACHE_DB")
+
+_DONE = object()
+
+
+class MissingApiKeyError(RuntimeError):
+    """MISTRAL_API_KEY n'est pas définie : l'assistant est indisponible."""
+
+
+def estimate_tokens(text):
+    # Approximation usuelle : environ 4 caractères par jeton
+    return len(text) // 4 + 1
+
+
+def history_window(messages, budget=HISTORY_TOKEN_BUDGET):
+    """Garde les messages les plus récents tenant dans le budget de jetons.
+
+    Le dernier message (la question posée) est toujours conservé.
+    """
+    window = []
+    used = 0
+    for message in reversed(messages):
+        cost = estimate_tokens(message["content"])
+        if window and used + cost > budget:
+            break
+        window.append({"role": message["role"], "content": message["content"]})
+        used += cost
+    window.reverse()
+    return window
+
+
+def normalize_text(text):
+    """Forme canonique d'un message : casse, accents composés, espaces et ponctuation finale."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.")
+
+
+def cache_key(messages, context=CACHE_CONTEXT_MESSAGES):
+    """Clé de cache : dernier message et les ``context`` messages qui le précèdent."""
+    window = [[m["role"], normalize_text(m["content"])] for m in messages[-(context + 1):]]
+    return hashlib.sha256(json.dumps(window, ensure_ascii=False).encode()).hexdigest()
+
+
+def make_cache(path=CACHE_DB):
+    backend = SqliteBackend(path) if path else None
+    return LRUCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL, backend=backend)
+
+
+class ChatBackend:
+    """Client de chat asynchrone unique, partagé par toutes les sessions."""
+
+    def __init__(self, api_key=API_KEY, endpoint=ENDPOINT, model=MODEL,
+                 history_budget=HISTORY_TOKEN_BUDGET, max_concurrent_requests=64, timeout=120,
+                 cache=None):
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.model = model
+        self.history_budget = history_budget
+        self.max_concurrent_requests = max_concurrent_requests
+        self.timeout = timeout
+        self.cache = make_cache() if cache is None else cache
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="chat-backend", daemon=True)
+        self._thread.start()
+
+    def _get_client(self):
+        # Créé dans la boucle du backend, où il sera toujours utilisé
+        if self._client is None:
+            from mistralai.async_client import MistralAsyncClient
+
+            self._client = MistralAsyncClient(
+                api_key=self.api_key,
+                endpoint=self.endpoint,
+                timeout=self.timeout,
+                max_concurrent_requests=self.max_concurrent_requests,
+            )
+        return self._client
+
+    async def _produce(self, messages, out):
+        try:
+            client = self._get_client()
+            async for chunk in client.chat_stream(model=self.model, messages=messages):
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    out.put(content)
+        except Exception as e:
+            out.put(e)
+        finally:
+            out.put(_DONE)
+
+    def stream(self, messages):
+        """Génère les morceaux de la réponse au fil de leur arrivée.
+
+        Seule la fenêtre récente de l'historique, bornée en jetons, est envoyée.
+        Une réponse déjà en cache est rendue d'un bloc, sans appel distant.
+        """
+        key = cache_key(messages)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        out = queue.Queue()
+        window = history_window(messages, self.history_budget)
+        start = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(self._produce(window, out), self._loop)
+        parts = []
+        try:
+            while True:
+                item = out.get(timeout=STREAM_TIMEOUT)
+                if item is _DONE:
+                    observe("chat_completion", time.perf_counter() - start)
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if not parts:
+                    observe("chat_first_token", time.perf_counter() - start)
+                parts.append(item)
+                yield item
+            # Seules les réponses complètes sont mises en cache, jamais les erreurs
+            if parts:
+                self.cache.set(key, "".join(parts))
+        finally:
+            # Lecture interrompue (session fermée, erreur) : on libère la requête
+            future.cancel()
+
+    def complete(self, messages):
+        return "".join(self.stream(messages))
+
+    def close(self):
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if not API_KEY:
+            raise MissingApiKeyError("Assistant indisponible : la variable d'environnement MISTRAL_API_KEY "
+                                     "n'est pas définie.")
+        with _backend_lock:
+            if _backend is None:
+                _backend = ChatBackend()
+                register_collector("chat_response", _backend.cache.stats)
+    return _backend
@@ -0,0 +1,374 @@
+"""Journal d'audit des prédictions, en segments Parquet append-only.
+
+Chaque prédiction (formulaire, lot, HTTP) est enregistrée avec son horodatage,
+les 30 caractéristiques, la version du modèle, le résultat et la latence.
+``record`` ne fait qu'ajouter une référence aux tableaux dans une file : un
+thread d'écriture regroupe les enregistrements et les écrit par blocs.
+
+Les segments sont rangés par jour (``date=AAAA-MM-JJ/``) et écrits sous un nom
+caché, renommé à la fermeture : un segment visible n'est plus jamais modifié.
+Un segment est fermé quand il dépasse ``segment_bytes``, qu'il est ouvert
+depuis ``segment_seconds`` ou que le jour change.
+
+Un bloc dont l'écriture échoue est journalisé (``logging``) et gardé pour
+être réécrit au tour suivant. La file est bornée à ``max_pending_rows``
+lignes non écrites : au-delà, ``record`` écarte les lignes et les compte dans
+``dropped_rows`` plutôt que de faire grossir la mémoire indéfiniment.
+
+    python audit.py summary --since 2026-01-01    # dérive par rapport à wisc_bc_data.csv
+"""
+import argparse
+import atexit
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from features import BASE_DIR, FEATURE_COLUMNS, N_FEATURES
+from metrics import register_collector
+
+AUDIT_DIR = os.environ.get("PREDCULTURE_AUDIT_DIR", os.path.join(BASE_DIR, "audit"))
+SEGMENT_BYTES = int(os.environ.get("PREDCULTURE_AUDIT_SEGMENT_BYTES", 64 << 20))
+SEGMENT_SECONDS = float(os.environ.get("PREDCULTURE_AUDIT_SEGMENT_SECONDS", "900"))
+FLUSH_INTERVAL = 1.0
+FLUSH_ROWS = 8192
+# Lignes en attente d'écriture au-delà desquelles record() les écarte (~60 Mio)
+MAX_PENDING_ROWS = int(os.environ.get("PREDCULTURE_AUDIT_MAX_PENDING_ROWS", 1 << 18))
+
+logger = logging.getLogger(__name__)
+
+
+def audit_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("source", pa.string()),
+            ("model_version", pa.string()),
+            ("prediction", pa.int64()),
+            ("probability_malignant", pa.float64()),
+            ("validation", pa.int8()),
+            ("latency_ms", pa.float64()),
+        ]
+        + [(col, pa.float64()) for col in FEATURE_COLUMNS]
+    )
+
+
+class AuditLog:
+    """Écrivain en arrière-plan ; ``record`` ne bloque jamais le chemin de prédiction."""
+
+    def __init__(self, directory=AUDIT_DIR, segment_bytes=SEGMENT_BYTES, segment_seconds=SEGMENT_SECONDS,
+                 flush_interval=FLUSH_INTERVAL, flush_rows=FLUSH_ROWS, max_pending_rows=MAX_PENDING_ROWS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.max_pending_rows = max_pending_rows
+        self.rows_written = 0
+        self.segments_written = 0
+        self.errors = 0
+        self.dropped_rows = 0
+        self._dropping = False
+        self._queue = queue.SimpleQueue()
+        # Blocs dont l'écriture a échoué, réessayés avant les nouveaux
+        self._retry = []
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._writer = None
+        self._segment = None
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, X, proba_malignant, prediction, model_version, latency, source, validation=None,
+               timestamp=None):
+        """Ajoute n lignes au journal.
+
+        ``latency`` (secondes) est celle de la requête qui contenait les lignes ;
+        les lignes sans prédiction (rejetées) ont ``prediction`` à -1.
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        with self._pending_lock:
+            if self._pending + X.shape[0] > self.max_pending_rows:
+                if not self._dropping:
+                    self._dropping = True
+                    logger.error("Journal d'audit saturé (%d lignes en attente) : lignes écartées", self._pending)
+                self.dropped_rows += X.shape[0]
+                return
+            self._pending += X.shape[0]
+        self._queue.put((
+            time.time() if timestamp is None else timestamp, X,
+            np.asarray(prediction).reshape(-1), np.asarray(proba_malignant, dtype=np.float64).reshape(-1),
+            None if validation is None else np.asarray(validation).reshape(-1),
+            latency, model_version, source,
+        ))
+
+    def _table(self, items):
+        import pyarrow as pa
+
+        n = [item[1].shape[0] for item in items]
+        timestamps = np.concatenate([np.full(k, item[0]) for k, item in zip(n, items)])
+        X = np.concatenate([item[1] for item in items])
+        prediction = np.concatenate([item[2] for item in items]).astype(np.int64)
+        columns = {
+            "timestamp": pa.array((timestamps * 1e6).astype(np.int64), pa.timestamp("us", tz="UTC")),
+            "source": pa.array(np.repeat([item[7] for item in items], n).tolist(), pa.string()),
+            "model_version": pa.array(np.repeat([str(item[6]) for item in items], n).tolist(), pa.string()),
+            "prediction": pa.array(prediction, mask=prediction < 0),
+            "probability_malignant": pa.array(np.concatenate([item[3] for item in items])),
+            "validation": pa.array(np.concatenate([
+                np.zeros(k, np.int8) if item[4] is None else item[4].astype(np.int8) for k, item in zip(n, items)
+            ])),
+            "latency_ms": pa.array(np.repeat([item[5] * 1000 for item in items], n)),
+        }
+        for i, col in enumerate(FEATURE_COLUMNS):
+            columns[col] = pa.array(X[:, i])
+        return pa.table(columns, schema=audit_schema())
+
+    def _open_segment(self, day):
+        import pyarrow.parquet as pq
+
+        partition = os.path.join(self.directory, f"date={day}")
+        os.makedirs(partition, exist_ok=True)
+        name = f"segment-{time.strftime('%H%M%S')}-{os.getpid()}-{self.segments_written:06d}.parquet"
+        self._writer = pq.ParquetWriter(os.path.join(partition, "." + name), audit_schema(), compression="zstd")
+        self._segment = (partition, name, day, time.monotonic())
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        partition, name = self._segment[:2]
+        os.replace(os.path.join(partition, "." + name), os.path.join(partition, name))
+        self._writer = self._segment = None
+        self.segments_written += 1
+
+    def _write(self, items):
+        day = datetime.datetime.fromtimestamp(items[-1][0], datetime.timezone.utc).strftime("%Y-%m-%d")
+        if self._segment is not None and self._segment[2] != day:
+            self._close_segment()
+        if self._writer is None:
+            self._open_segment(day)
+        table = self._table(items)
+        self._writer.write_table(table)
+        self.rows_written += table.num_rows
+
+    def _rotate(self):
+        partition, name, _, opened = self._segment
+        size = os.path.getsize(os.path.join(partition, "." + name))
+        if size >= self.segment_bytes or time.monotonic() - opened >= self.segment_seconds:
+            self._close_segment()
+
+    def _abandon_segment(self):
+        # Écrivain dans un état inconnu après une erreur : le segment caché reste
+        # sur disque pour inspection, le prochain bloc en ouvre un nouveau
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+        self._writer = self._segment = None
+
+    def _run(self):
+        stop = False
+        while not stop:
+            items, self._retry = self._retry, []
+            rows = 0
+            deadline = time.monotonic() + self.flush_interval
+            while rows < self.flush_rows:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+                rows += item[1].shape[0]
+            written = 0
+            if items:
+                try:
+                    self._write(items)
+                    written = sum(item[1].shape[0] for item in items)
+                except Exception:
+                    # Le journal ne doit jamais interrompre le service : le bloc sera réécrit
+                    self.errors += 1
+                    logger.exception("Écriture du journal d'audit impossible (%d blocs gardés pour réessai)",
+                                     len(items))
+                    self._retry = items
+                    if self._writer is not None:
+                        self._abandon_segment()
+            try:
+                if self._segment is not None:
+                    self._rotate()
+            except Exception:
+                self.errors += 1
+                logger.exception("Fermeture du segment d'audit impossible")
+                self._abandon_segment()
+            with self._pending_lock:
+                self._pending -= written
+                if self._dropping and self._pending < self.max_pending_rows // 2:
+                    self._dropping = False
+                    logger.warning("Journal d'audit rétabli (%d lignes écartées au total)", self.dropped_rows)
+        if self._retry:
+            lost = sum(item[1].shape[0] for item in self._retry)
+            try:
+                self._write(self._retry)
+            except Exception:
+                logger.exception("Journal d'audit : %d lignes non écrites à l'arrêt", lost)
+        try:
+            self._close_segment()
+        except Exception:
+            self.errors += 1
+            logger.exception("Fermeture du segment d'audit impossible")
+
+    def flush(self, timeout=10.0):
+        """Attend que tous les enregistrements en file soient écrits (sans fermer le segment)."""
+        deadline = time.monotonic() + timeout
+        while self._pending > 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self):
+        return {
+            "rows_written": self.rows_written,
+            "segments_written": self.segments_written,
+            "pending_rows": self._pending,
+            "errors": self.errors,
+            "dropped_rows": self.dropped_rows,
+        }
+
+
+_audit_log = None
+_audit_lock = threading.Lock()
+
+
+def get_audit_log():
+    """Journal du processus, ou None si ``PREDCULTURE_AUDIT=0``."""
+    global _audit_log
+    if os.environ.get("PREDCULTURE_AUDIT", "1") == "0":
+        return None
+    if _audit_log is None:
+        with _audit_lock:
+            if _audit_log is None:
+                _audit_log = AuditLog()
+                register_collector("audit", _audit_log.stats)
+                # Ferme le segment courant pour qu'il devienne lisible
+                atexit.register(_audit_log.close)
+    return _audit_log
+
+
+def close_audit_log():
+    """Vide la file et ferme le segment courant (processus forkés, qui sautent atexit)."""
+    if _audit_log is not None:
+        _audit_log.close()
+
+
+def _dataset(directory, since=None, until=None, model_version=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = audit_schema().append(pa.field("date", pa.string()))
+    if not os.path.isdir(directory):
+        return ds.dataset(schema.empty_table()), None
+    # Les segments en cours d'écriture sont cachés (préfixe « . ») et ignorés
+    dataset = ds.dataset(directory, format="parquet", schema=schema,
+                         partitioning=ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive"))
+    filters = []
+    if since:
+        filters.append(ds.field("date") >= since)
+    if until:
+        filters.append(ds.field("date") <= until)
+    if model_version:
+        filters.append(ds.field("model_version") == model_version)
+    expr = None
+    for condition in filters:
+        expr = condition if expr is None else expr & condition
+    return dataset, expr
+
+
+def scan(directory=AUDIT_DIR, since=None, until=None, columns=None, model_version=None):
+    """Table des segments fermés ; ``since``/``until`` en dates AAAA-MM-JJ incluses.
+
+    Le filtre sur la partition ``date`` évite d'ouvrir les jours hors période,
+    et seules les colonnes demandées sont lues.
+    """
+    dataset, expr = _dataset(directory, since, until, model_version)
+    return dataset.to_table(columns=columns, filter=expr)
+
+
+def iter_features(directory=AUDIT_DIR, since=None, until=None, model_version=None):
+    """Matrices (n, 30) des entrées journalisées, bloc par bloc, sans tout charger."""
+    dataset, expr = _dataset(directory, since, until, model_version)
+    for batch in dataset.to_batches(columns=list(FEATURE_COLUMNS), filter=expr):
+        if batch.num_rows:
+            yield np.column_stack([batch.column(i).to_numpy(zero_copy_only=False) for i in range(N_FEATURES)])
+
+
+def feature_summary(directory=AUDIT_DIR, since=None, until=None, stats=None):
+    """Compare les entrées journalisées aux statistiques de wisc_bc_data.csv.
+
+    Pour chaque caractéristique : moyenne observée, écart de moyenne en écarts
+    types d'entraînement et part des valeurs hors du [min, max] d'entraînement.
+    La lecture se fait par blocs : la mémoire ne dépend pas de la période.
+    """
+    if stats is None:
+        from validation import get_validator
+
+        stats = get_validator().stats
+    lower, upper = np.array(stats["min"]), np.array(stats["max"])
+    rows = 0
+    total = np.zeros(N_FEATURES)
+    outside = np.zeros(N_FEATURES)
+    for X in iter_features(directory, since, until):
+        rows += X.shape[0]
+        total += X.sum(axis=0)
+        outside += np.count_nonzero((X < lower) | (X > upper), axis=0)
+
+    std = np.array(stats["std"])
+    std[std == 0] = 1.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        observed = total / rows
+        outside = outside / rows
+    shift = (observed - np.array(stats["mean"])) / std
+    return {
+        "rows": rows,
+        "features": [
+            {"feature": col, "mean": float(observed[i]), "mean_shift_std": float(shift[i]),
+             "out_of_range": float(outside[i])}
+            for i, col in enumerate(FEATURE_COLUMNS)
+        ],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lecture du journal d'audit des prédictions")
+    parser.add_argument("command", choices=("summary", "count"))
+    parser.add_argument("--dir", default=AUDIT_DIR)
+    parser.add_argument("--since", help="Date de début AAAA-MM-JJ")
+    parser.add_argument("--until", help="Date de fin AAAA-MM-JJ")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "count":
+        table = scan(args.dir, args.since, args.until, columns=["model_version"])
+        print(f"{table.num_rows} prédictions")
+    else:
+        summary = feature_summary(args.dir, args.since, args.until)
+        print(f"{summary['rows']} prédictions")
+        for row in sorted(summary["features"], key=lambda r: -abs(r["mean_shift_std"])):
+            print(f"{row['feature']:>25} moyenne {row['mean']:12.5g}  écart {row['mean_shift_std']:+7.2f} σ  "
+                  f"hors plage {row['out_of_range']:6.1%}")
+    print(f"lecture en {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Analyse par lot d'un fichier CSV ou Parquet au format wisc_bc_data.csv.
+
+Le fichier est lu par blocs : chaque bloc est projeté et classé d'un coup,
+puis écrit aussitôt dans le fichier de résultats. La mémoire reste constante
+quelle que soit la taille du fichier. Chaque bloc est d'abord contrôlé par le
+validateur de validation.py : les lignes rejetées ne sont pas classées.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from features import CLASS_LABELS, FEATURE_COLUMNS, MALIGNANT_CLASS
+
+DEFAULT_CHUNKSIZE = 10_000
+# Colonnes d'identification recopiées telles quelles dans les résultats
+ID_COLUMNS = ("id",)
+CONTRIBUTION_COLUMNS = [f"contribution_{col}" for col in FEATURE_COLUMNS]
+
+
+def _detect_format(source, fmt=None):
+    if fmt:
+        return fmt
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+    return "parquet" if str(name).lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def _check_columns(columns):
+    missing = [col for col in FEATURE_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+
+
+def iter_chunks(source, chunksize=DEFAULT_CHUNKSIZE, fmt=None):
+    """Itère sur (identifiants, matrice des 30 caractéristiques) par bloc."""
+    if _detect_format(source, fmt) == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(source)
+        names = parquet.schema_arrow.names
+        _check_columns(names)
+        ids = [col for col in ID_COLUMNS if col in names]
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=ids + FEATURE_COLUMNS):
+            frame = batch.to_pandas()
+            yield frame[ids], frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    else:
+        import pandas as pd
+
+        wanted = set(FEATURE_COLUMNS) | set(ID_COLUMNS)
+        reader = pd.read_csv(source, chunksize=chunksize, usecols=lambda col: col in wanted)
+        for frame in reader:
+            _check_columns(frame.columns)
+            ids = [col for col in ID_COLUMNS if col in frame.columns]
+            yield frame[ids], frame[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def _predict(pipeline, X, explainer):
+    if explainer is None:
+        return pipeline.predict_proba(X), None
+    explanation = explainer.explain(X)
+    return explanation.proba, explanation.contributions
+
+
+def score_chunks(pipeline, chunks, validator=None, explainer=None, audit_log=None, drift_monitor=None):
+    """Applique le pipeline à chaque bloc et produit un DataFrame de résultats.
+
+    Avec un validateur, une colonne ``validation`` est ajoutée et les lignes
+    rejetées gardent une prédiction vide. Avec un explicateur, une colonne
+    ``contribution_<caractéristique>`` est ajoutée par entrée. Avec un journal
+    d'audit, chaque bloc y est enregistré avec sa durée de traitement ; avec un
+    moniteur de dérive, les lignes classées mettent à jour ses résumés.
+    """
+    import pandas as pd
+
+    malignant = int(np.flatnonzero(pipeline.classes == MALIGNANT_CLASS)[0])
+    for ids, X in chunks:
+        started = time.perf_counter()
+        result = ids.reset_index(drop=True)
+        if validator is None:
+            proba, contributions = _predict(pipeline, X, explainer)
+            prediction = pipeline.classes.take(np.argmax(proba, axis=1))
+            if audit_log is not None:
+                audit_log.record(X, proba[:, malignant], prediction, pipeline.version,
+                                 time.perf_counter() - started, "batch")
+            if drift_monitor is not None:
+                drift_monitor.update(X)
+            result["prediction"] = prediction
+            result["diagnosis"] = [CLASS_LABELS.get(int(p), str(p)) for p in prediction]
+            result["probability_malignant"] = proba[:, malignant]
+            if contributions is not None:
+                result[CONTRIBUTION_COLUMNS] = contributions
+            yield result
+            continue
+
+        report = validator.validate(X)
+        accepted = report.accepted
+        proba = np.full((X.shape[0], len(pipeline.classes)), np.nan)
+        contributions = np.full(X.shape, np.nan)
+        if accepted.any():
+            proba[accepted], accepted_contributions = _predict(pipeline, X[accepted], explainer)
+            if accepted_contributions is not None:
+                contributions[accepted] = accepted_contributions
+        labels = np.where(accepted, pipeline.classes.take(np.argmax(np.nan_to_num(proba), axis=1)), -1)
+        if audit_log is not None:
+            audit_log.record(X, proba[:, malignant], labels, pipeline.version,
+                             time.perf_counter() - started, "batch", report.status)
+        if drift_monitor is not None:
+            drift_monitor.update(X[accepted])
+        prediction = pd.array(labels, dtype="Int64")
+        prediction[~accepted] = pd.NA
+        result["prediction"] = prediction
+        result["diagnosis"] = [None if p is pd.NA else CLASS_LABELS.get(int(p), str(p)) for p in prediction]
+        result["probability_malignant"] = proba[:, malignant]
+        result["validation"] = report.labels()
+        if explainer is not None:
+            result[CONTRIBUTION_COLUMNS] = contributions
+        yield result
+
+
+def _result_schema(schema):
+    """Schéma Parquet fixé dès le premier bloc.
+
+    Sans cela, un premier bloc entièrement rejeté donnerait des colonnes de
+    type null, incompatibles avec les blocs suivants.
+    """
+    import pyarrow as pa
+
+    types = {"prediction": pa.int64(), "diagnosis": pa.string(), "probability_malignant": pa.float64(),
+             "validation": pa.string()}
+    types.update((col, pa.float64()) for col in CONTRIBUTION_COLUMNS)
+    return pa.schema([pa.field(f.name, types.get(f.name, f.type)) for f in schema])
+
+
+def score_file(source, destination, pipeline=None, chunksize=DEFAULT_CHUNKSIZE, fmt=None, validate=True,
+               explain=False, audit=True, drift=True):
+    """Analyse tout le fichier source et écrit les résultats bloc par bloc.
+
+    La destination est écrite en Parquet si son nom se termine par .parquet,
+    en CSV sinon. Retourne un résumé (lignes, tumeurs malignes, lignes hors
+    plage et rejetées).
+    """
+    if pipeline is None:
+        from inference import get_pipeline
+
+        pipeline = get_pipeline()
+    validator = None
+    if validate:
+        from validation import get_validator
+
+        validator = get_validator()
+    explainer = None
+    if explain:
+        from explain import get_explainer
+
+        explainer = get_explainer(pipeline)
+    audit_log = None
+    if audit:
+        from audit import get_audit_log
+
+        audit_log = get_audit_log()
+    drift_monitor = None
+    if drift:
+        from drift import get_drift_monitor
+
+        drift_monitor = get_drift_monitor(pipeline)
+
+    rows = malignant = out_of_range = rejected = 0
+    writer = None
+    out_format = _detect_format(destination)
+    try:
+        chunks = iter_chunks(source, chunksize, fmt)
+        for i, result in enumerate(score_chunks(pipeline, chunks, validator, explainer, audit_log, drift_monitor)):
+            if out_format == "parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(result, preserve_index=False)
+                if writer is None:
+                    schema = _result_schema(table.schema)
+                    writer = pq.ParquetWriter(destination, schema)
+                writer.write_table(table.cast(schema))
+            else:
+                result.to_csv(destination, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            rows += len(result)
+            malignant += int((result["prediction"] == MALIGNANT_CLASS).sum())
+            if validator is not None:
+                out_of_range += int((result["validation"] == "hors_plage").sum())
+                rejected += int((result["validation"] == "rejetee").sum())
+    finally:
+        if writer is not None:
+            writer.close()
+    return {"rows": rows, "malignant": malignant, "out_of_range": out_of_range, "rejected": rejected}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse par lot d'un fichier CSV/Parquet")
+    parser.add_argument("source", help="Fichier CSV ou Parquet au format wisc_bc_data.csv")
+    parser.add_argument("-o", "--output", default="predictions.csv",
+                        help="Fichier de résultats (.csv ou .parquet)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--no-validation", action="store_true",
+                        help="Classe toutes les lignes sans contrôle des plages d'entraînement")
+    parser.add_argument("--explain", action="store_true",
+                        help="Ajoute les contributions des 30 caractéristiques à la probabilité de malignité")
+    parser.add_argument("--precision", choices=("float64", "float32"), default=None,
+                        help="Précision réduite, refusée si elle change une prédiction de référence")
+    args = parser.parse_args(argv)
+
+    pipeline = None
+    if args.precision:
+        from inference import get_pipeline, reduce_precision
+
+        try:
+            pipeline = reduce_precision(get_pipeline(), args.precision)
+        except ValueError as e:
+            # Garde-fou refusé (PrecisionGuardrailError) ou pipeline sklearn non compilé
+            parser.exit(1, f"{e}\n")
+
+    summary = score_file(args.source, args.output, pipeline=pipeline, chunksize=args.chunksize,
+                         validate=not args.no_validation, explain=args.explain)
+    print(f"{summary['rows']} lignes analysées, {summary['malignant']} tumeurs malignes, "
+          f"{summary['out_of_range']} hors plage, {summary['rejected']} rejetées -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
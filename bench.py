@@ -0,0 +1,297 @@
+"""Banc d'essai reproductible du chemin de prédiction de bout en bout.
+
+Chaque étape (chargement des artefacts, scaler, PCA, modèle, pipeline compilé,
+rendu du graphique) est mesurée sur des lignes de wisc_bc_data.csv tirées avec
+une graine fixe, pour des tailles de lot de 1 à 100 000.
+
+    python bench.py --output bench_results.json
+    python bench.py --save-baseline bench_baseline.json
+    python bench.py --baseline bench_baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from features import load_feature_matrix
+
+BATCH_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+
+# Étapes mesurées : nom -> fonction (contexte) -> appelable (X)
+STAGES = {}
+
+
+def stage(name, batched=True):
+    def register(factory):
+        STAGES[name] = (factory, batched)
+        return factory
+    return register
+
+
+@stage("artifact_load", batched=False)
+def _artifact_load(ctx):
+    from artifacts import ArtifactRegistry
+
+    # Registre neuf à chaque appel : mesure un chargement à froid complet
+    return lambda X: ArtifactRegistry().get()
+
+
+@stage("compact_load", batched=False)
+def _compact_load(ctx):
+    import os
+    import tempfile
+
+    from compact import export_compact, load_compact
+    from inference import compile_artifacts
+
+    path = os.path.join(tempfile.mkdtemp(), "model.bin")
+    export_compact(compile_artifacts(ctx["artifacts"]), path)
+    return lambda X: load_compact(path)
+
+
+@stage("scaler_transform")
+def _scaler_transform(ctx):
+    scaler = ctx["artifacts"].scaler
+    return lambda X: scaler.transform(X)
+
+
+@stage("pca_transform")
+def _pca_transform(ctx):
+    scaler, pca = ctx["artifacts"].scaler, ctx["artifacts"].pca
+    scaled = {}
+
+    def run(X):
+        key = X.shape[0]
+        if key not in scaled:
+            scaled[key] = scaler.transform(X)
+        return pca.transform(scaled[key])
+    return run
+
+
+@stage("model_predict")
+def _model_predict(ctx):
+    scaler, pca, model = ctx["artifacts"].scaler, ctx["artifacts"].pca, ctx["artifacts"].model
+    projected = {}
+
+    def run(X):
+        key = X.shape[0]
+        if key not in projected:
+            projected[key] = pca.transform(scaler.transform(X))
+        return model.predict(projected[key])
+    return run
+
+
+@stage("reference_pipeline")
+def _reference_pipeline(ctx):
+    from inference import ReferencePipeline
+
+    a = ctx["artifacts"]
+    pipeline = ReferencePipeline(a.scaler, a.pca, a.model)
+    return pipeline.predict
+
+
+@stage("compiled_pipeline")
+def _compiled_pipeline(ctx):
+    from inference import compile_artifacts
+
+    return compile_artifacts(ctx["artifacts"]).predict
+
+
+@stage("input_validation")
+def _input_validation(ctx):
+    from validation import get_validator
+
+    return get_validator().validate
+
+
+@stage("explain")
+def _explain(ctx):
+    from explain import Explainer
+    from inference import compile_artifacts
+
+    return Explainer(compile_artifacts(ctx["artifacts"])).explain
+
+
+@stage("compiled_float32")
+def _compiled_float32(ctx):
+    from inference import compile_artifacts, reduce_precision
+
+    return reduce_precision(compile_artifacts(ctx["artifacts"]), "float32").predict
+
+
+@stage("figure_render", batched=False)
+def _figure_render(ctx):
+    # Ancien rendu matplotlib par prédiction, conservé comme point de comparaison
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    def run(X):
+        fig, ax = plt.subplots(figsize=(8, 4))
+        ax.barh(['Résultat'], [1], color=['#F44336'])
+        ax.set_xlim(0, 1)
+        ax.set_xticks([])
+        ax.text(0.5, 0, 'Malin', ha='center', va='center', color='white', fontsize=12)
+        fig.canvas.draw()
+        plt.close(fig)
+    return run
+
+
+@stage("result_render", batched=False)
+def _result_render(ctx):
+    from rendering import result_chart_png
+
+    # Rendu actuel : image PNG mise en cache par classe
+    return lambda X: result_chart_png(True)
+
+
+def _maxrss_mb():
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def rss_mb():
+    """Mémoire résidente actuelle du processus, en Mio."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return _maxrss_mb()
+
+
+def reset_peak_rss():
+    """Ramène le pic de mémoire résidente (VmHWM) à la valeur actuelle (Linux)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente depuis le dernier ``reset_peak_rss``, en Mio.
+
+    Hors Linux, repli sur ``ru_maxrss`` : pic du processus entier, qui ne fait
+    que croître d'une étape à l'autre.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return _maxrss_mb()
+
+
+def measure(fn, X, min_time=0.5, min_repeat=3, max_repeat=1000, rss_before=None):
+    # Pic propre à ce cas : allocations transitoires des gros lots comprises
+    reset_peak_rss()
+    fn(X)  # échauffement
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_repeat and (len(timings) < min_repeat or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - t0)
+    timings = np.array(timings)
+    rss = rss_mb()
+    rows = X.shape[0]
+    return {
+        "repeat": len(timings),
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p90_ms": float(np.percentile(timings, 90) * 1000),
+        "p99_ms": float(np.percentile(timings, 99) * 1000),
+        "rows_per_s": float(rows / np.median(timings)),
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_mb": rss,
+        # Mémoire retenue depuis la construction de l'étape (modèle, caches, tampons)
+        "rss_delta_mb": rss - rss_before if rss_before is not None else None,
+    }
+
+
+def run(stages=None, batch_sizes=BATCH_SIZES, seed=0, min_time=0.5):
+    from artifacts import ArtifactRegistry
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    data = load_feature_matrix()
+    rng = np.random.default_rng(seed)
+    ctx = {"artifacts": ArtifactRegistry().get()}
+
+    results = []
+    for name in stages or STAGES:
+        factory, batched = STAGES[name]
+        rss_before = rss_mb()
+        try:
+            fn = factory(ctx)
+        except ImportError as e:
+            print(f"{name}: ignorée ({e})", file=sys.stderr)
+            continue
+        for size in batch_sizes if batched else (1,):
+            X = data[rng.integers(0, len(data), size)]
+            result = {"stage": name, "batch_size": size, **measure(fn, X, min_time=min_time, rss_before=rss_before)}
+            results.append(result)
+            print(f"{name:>20} n={size:<7} p50={result['p50_ms']:.3f} ms "
+                  f"p99={result['p99_ms']:.3f} ms {result['rows_per_s']:.0f} lignes/s "
+                  f"pic={result['peak_rss_mb']:.0f} Mio rss={result['rss_mb']:.0f} Mio ({result['rss_delta_mb']:+.1f})", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Liste les étapes dont la latence médiane dépasse la référence de plus de ``tolerance``."""
+    reference = {(r["stage"], r["batch_size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        ref = reference.get((result["stage"], result["batch_size"]))
+        if ref and result["p50_ms"] > ref["p50_ms"] * (1 + tolerance):
+            regressions.append({
+                "stage": result["stage"],
+                "batch_size": result["batch_size"],
+                "baseline_p50_ms": ref["p50_ms"],
+                "p50_ms": result["p50_ms"],
+                "ratio": result["p50_ms"] / ref["p50_ms"],
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai du chemin de prédiction")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), help="Étapes à mesurer (toutes par défaut)")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(BATCH_SIZES))
+    parser.add_argument("--min-time", type=float, default=0.5, help="Durée minimale de mesure par cas (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Rapport de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", help="Enregistre aussi le rapport comme nouvelle référence")
+    args = parser.parse_args(argv)
+
+    report = run(args.stages, args.batch_sizes, args.seed, args.min_time)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for reg in report.get("regressions", []):
+        print(f"RÉGRESSION {reg['stage']} n={reg['batch_size']}: "
+              f"{reg['baseline_p50_ms']:.3f} -> {reg['p50_ms']:.3f} ms (x{reg['ratio']:.2f})", file=sys.stderr)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
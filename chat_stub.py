@@ -0,0 +1,92 @@
+"""Serveur local imitant l'API chat/completions de Mistral, pour les essais.
+
+Répond en flux (Server-Sent Events) ou d'un bloc, avec un délai réglable par
+jeton pour simuler une complétion lente.
+
+    python chat_stub.py --port 8900 --token-delay 0.05
+    MISTRAL_API_KEY=stub MISTRAL_ENDPOINT=http://127.0.0.1:8900 streamlit run app_projet.py
+"""
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def reply_for(messages):
+    question = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    return f"Réponse simulée ({len(messages)} messages reçus) : {question}"
+
+
+class ChatStubHandler(BaseHTTPRequestHandler):
+    token_delay = 0.0
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        reply = reply_for(request.get("messages", []))
+        completion_id = f"stub-{uuid.uuid4().hex[:8]}"
+        model = request.get("model", "stub")
+
+        if not request.get("stream"):
+            time.sleep(self.token_delay * len(reply.split()))
+            body = json.dumps({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        # Flux SSE : un événement par mot, puis [DONE] ; la connexion est fermée à la fin
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.token_delay)
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                             "finish_reason": "stop" if i == len(words) - 1 else None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8900, token_delay=0.0):
+    handler = type("Handler", (ChatStubHandler,), {"token_delay": token_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur factice de l'API chat/completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Délai par jeton (s)")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.token_delay)
+    print(f"API chat factice sur http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Format compact des artefacts : tableaux numpy bruts projetables en mémoire.
+
+Le fichier contient un court en-tête JSON suivi des tableaux du pipeline
+compilé (centre/échelle du scaler, moyenne et composantes de la PCA, nœuds de
+la forêt), chacun aligné sur 64 octets :
+
+    PRCMODEL | longueur de l'en-tête (uint32) | en-tête JSON | tableaux alignés
+
+Le chargement ne désérialise rien : les tableaux sont des vues d'un seul
+``np.memmap`` en lecture seule. Tous les processus qui ouvrent le même fichier
+partagent donc les mêmes pages du cache du système.
+
+    python compact.py export            # model.bin depuis les .pkl servis
+    PREDCULTURE_COMPACT_MODEL=model.bin streamlit run app_projet.py
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+
+import numpy as np
+
+from artifacts import BASE_DIR
+from features import FEATURE_COLUMNS
+
+COMPACT_FILE = "model.bin"
+MAGIC = b"PRCMODEL"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def encode(pipeline):
+    """Sérialise les tableaux d'un CompiledPipeline au format compact (bytes)."""
+    if not pipeline.has_forest:
+        raise ValueError("Seuls les classifieurs à base d'arbres ont un format compact")
+
+    arrays = {name: np.asarray(a, order="C") for name, a in pipeline.arrays.items()}
+    specs = {}
+    offset = 0
+    for name, a in arrays.items():
+        specs[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset = _align(offset + a.nbytes)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "version": pipeline.version,
+        "fold": pipeline.fold,
+        "feature_columns": FEATURE_COLUMNS,
+        "arrays": specs,
+    }
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(len(MAGIC) + 4 + len(header_bytes))
+
+    out = bytearray(data_start + offset)
+    prefix = MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes
+    out[:len(prefix)] = prefix
+    for name, a in arrays.items():
+        pos = data_start + specs[name]["offset"]
+        out[pos:pos + a.nbytes] = a.tobytes()
+    return bytes(out)
+
+
+def export_compact(pipeline, path):
+    """Écrit le fichier compact ; il est remplacé atomiquement."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode(pipeline))
+    # Les processus ayant déjà projeté l'ancien fichier gardent leur version
+    os.replace(tmp, path)
+    return path
+
+
+def parse_header(buffer):
+    prefix = bytes(buffer[:len(MAGIC) + 4])
+    if prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError("Tampon hors format compact")
+    (length,) = struct.unpack("<I", prefix[len(MAGIC):])
+    header = json.loads(bytes(buffer[len(MAGIC) + 4:len(MAGIC) + 4 + length]))
+    if header["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Version de format non supportée : {header['format_version']}")
+    if header["feature_columns"] != FEATURE_COLUMNS:
+        raise ValueError("L'ordre des colonnes du modèle ne correspond pas au schéma attendu")
+    header["data_start"] = _align(len(MAGIC) + 4 + length)
+    return header
+
+
+def map_arrays(buffer, header):
+    """Vues sans copie des tableaux décrits par l'en-tête, dans un tampon d'octets."""
+    start = header["data_start"]
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        offset = start + spec["offset"]
+        view = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(tuple(spec["shape"]))
+        view.flags.writeable = False
+        arrays[name] = view
+    return arrays
+
+
+def from_buffer(buffer):
+    """Pipeline compilé dont les tableaux sont des vues du tampon (fichier, mémoire partagée)."""
+    from inference import CompiledPipeline
+
+    header = parse_header(buffer)
+    return CompiledPipeline(map_arrays(buffer, header), fold=header["fold"], version=header["version"])
+
+
+def load_compact(path):
+    """Charge un pipeline compilé depuis un fichier compact, sans copie."""
+    return from_buffer(np.memmap(path, dtype=np.uint8, mode="r"))
+
+
+_compact = None
+_compact_key = None
+_compact_lock = threading.Lock()
+
+
+def get_compact_pipeline(path):
+    """Pipeline compact du processus, rechargé si le fichier est remplacé."""
+    global _compact, _compact_key
+    st = os.stat(path)
+    key = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    if _compact is not None and _compact_key == key:
+        return _compact
+    with _compact_lock:
+        if _compact is None or _compact_key != key:
+            from inference import apply_precision
+
+            _compact = apply_precision(load_compact(path))
+            _compact_key = key
+        return _compact
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export / vérification du format compact")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, COMPACT_FILE))
+    args = parser.parse_args(argv)
+
+    from artifacts import load_artifacts
+    from features import load_feature_matrix
+    from inference import ReferencePipeline, compile_artifacts, verify
+
+    artifacts = load_artifacts()
+    if args.command == "export":
+        export_compact(compile_artifacts(artifacts), args.output)
+        print(f"{args.output} : {os.path.getsize(args.output) / 1024:.0f} Kio")
+
+    pipeline = load_compact(args.output)
+    reference = ReferencePipeline(artifacts.scaler, artifacts.pca, artifacts.model)
+    report = verify(pipeline, reference, load_feature_matrix())
+    print(report)
+    return 1 if report["label_mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
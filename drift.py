@@ -0,0 +1,268 @@
+"""Surveillance incrémentale de la dérive des entrées par rapport à wisc_bc_data.csv.
+
+Pour chacune des 30 caractéristiques et des composantes PCA, le moniteur tient
+des résumés de taille fixe, mis à jour à chaque prédiction sans conserver le
+flux brut :
+
+- moments glissants (effectif, moyenne, variance par Welford/Chan, min, max) ;
+- histogramme sur les déciles d'entraînement, d'où l'on tire le PSI
+  (population stability index) et une statistique de Kolmogorov-Smirnov
+  calculée sur les bornes des déciles.
+
+La mémoire ne dépend pas du nombre de lignes vues ; une mise à jour coûte
+quelques opérations numpy par lot, soit O(1) par ligne.
+
+    python drift.py bench --rows 5000000     # débit et mémoire sur 5 M lignes
+"""
+import argparse
+import json
+import threading
+
+import numpy as np
+
+from features import FEATURE_COLUMNS, N_FEATURES, load_feature_matrix
+from metrics import muted, register_collector, timed, unregister_collector
+
+# Bornes intérieures des histogrammes : déciles des données d'entraînement
+REFERENCE_QUANTILES = tuple(np.linspace(0.1, 0.9, 9))
+# Plancher des proportions : évite log(0) pour un seuil jamais atteint
+PSI_FLOOR = 1e-4
+PSI_WARNING, PSI_ALERT = 0.1, 0.25
+# En deçà, les scores sont trop bruités pour déclencher une alerte
+MIN_ROWS = 100
+# Les gros lots sont découpés : la matrice de comparaison reste bornée
+UPDATE_CHUNK = 4096
+
+
+class RunningMoments:
+    """Moyenne et variance par colonne, fusionnées lot par lot (Welford/Chan)."""
+
+    def __init__(self, d):
+        self.count = 0
+        self.mean = np.zeros(d)
+        self.m2 = np.zeros(d)
+        self.min = np.full(d, np.inf)
+        self.max = np.full(d, -np.inf)
+
+    def update(self, X):
+        n = X.shape[0]
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * (n / total)
+        self.m2 += batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+        np.minimum(self.min, X.min(axis=0), out=self.min)
+        np.maximum(self.max, X.max(axis=0), out=self.max)
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else np.full_like(self.mean, np.nan)
+
+
+class BinnedSketch:
+    """Comptes par colonne sur des bornes fixes ``edges`` (d, E) : E + 1 intervalles."""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        d, n_edges = self.edges.shape
+        self.n_bins = n_edges + 1
+        self.counts = np.zeros((d, self.n_bins), dtype=np.int64)
+        self._offsets = np.arange(d) * self.n_bins
+
+    def bin_counts(self, X):
+        # Indice d'intervalle = nombre de bornes dépassées, pour toutes les colonnes d'un coup
+        bins = (X[:, :, np.newaxis] > self.edges).sum(axis=2)
+        bins += self._offsets
+        return np.bincount(bins.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+
+    def update(self, X):
+        self.counts += self.bin_counts(X)
+
+
+def psi(observed, expected):
+    """PSI par ligne entre deux tableaux de comptes (d, B)."""
+    p = np.maximum(observed / np.maximum(observed.sum(axis=1, keepdims=True), 1), PSI_FLOOR)
+    q = np.maximum(expected / np.maximum(expected.sum(axis=1, keepdims=True), 1), PSI_FLOOR)
+    return ((p - q) * np.log(p / q)).sum(axis=1)
+
+
+def ks(observed, expected):
+    """Écart maximal entre fonctions de répartition, évalué aux bornes des intervalles."""
+    p = np.cumsum(observed, axis=1) / np.maximum(observed.sum(axis=1, keepdims=True), 1)
+    q = np.cumsum(expected, axis=1) / np.maximum(expected.sum(axis=1, keepdims=True), 1)
+    return np.abs(p - q).max(axis=1)
+
+
+class _Space:
+    # Résumés d'un espace (caractéristiques ou composantes PCA) et leur référence
+    def __init__(self, names, reference):
+        self.names = list(names)
+        edges = np.quantile(reference, REFERENCE_QUANTILES, axis=0).T
+        self.sketch = BinnedSketch(edges)
+        self.expected = self.sketch.bin_counts(reference)
+        self.reference_mean = reference.mean(axis=0)
+        std = reference.std(axis=0)
+        std[std == 0] = 1.0
+        self.reference_std = std
+        self.moments = RunningMoments(len(self.names))
+
+    def update(self, X):
+        self.moments.update(X)
+        self.sketch.update(X)
+
+    def scores(self):
+        counts = self.sketch.counts
+        psi_values = psi(counts, self.expected)
+        ks_values = ks(counts, self.expected)
+        shift = (self.moments.mean - self.reference_mean) / self.reference_std
+        ratio = self.moments.std / self.reference_std
+        return [
+            {"name": name, "psi": float(psi_values[i]), "ks": float(ks_values[i]),
+             "mean": float(self.moments.mean[i]), "mean_shift_std": float(shift[i]), "std_ratio": float(ratio[i])}
+            for i, name in enumerate(self.names)
+        ]
+
+
+class DriftMonitor:
+    """Résumés incrémentaux des entrées vues, comparés aux données d'entraînement.
+
+    ``transform`` projette un lot dans l'espace PCA (``pipeline.transform``) ;
+    sans lui, seules les 30 caractéristiques sont suivies.
+    """
+
+    def __init__(self, reference, transform=None, version=None):
+        reference = np.asarray(reference, dtype=np.float64).reshape(-1, N_FEATURES)
+        self.version = version
+        self.transform = transform
+        self.features = _Space(FEATURE_COLUMNS, reference)
+        self.components = None
+        if transform is not None:
+            # Projection de la référence : ce n'est pas une requête servie
+            with muted():
+                projected = np.asarray(transform(reference), dtype=np.float64)
+            self.components = _Space([f"pc{j + 1}" for j in range(projected.shape[1])], projected)
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self):
+        return self.features.moments.count
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        # Un seul NaN rendrait moyenne et variance NaN pour le reste du processus
+        # (lots non validés : batch.py --no-validation)
+        X = X[np.isfinite(X).all(axis=1)]
+        if not X.shape[0]:
+            return
+        with timed("drift_update"):
+            for start in range(0, X.shape[0], UPDATE_CHUNK):
+                chunk = X[start:start + UPDATE_CHUNK]
+                projected = None
+                if self.components is not None:
+                    projected = np.asarray(self.transform(chunk), dtype=np.float64)
+                with self._lock:
+                    self.features.update(chunk)
+                    if projected is not None:
+                        self.components.update(projected)
+
+    def scores(self):
+        with self._lock:
+            return {
+                "rows": self.rows,
+                "features": self.features.scores() if self.rows else [],
+                "components": self.components.scores() if self.rows and self.components is not None else [],
+            }
+
+    def stats(self):
+        """Jauges pour le panneau d'administration et /metrics."""
+        scores = self.scores()
+        values = {"rows": scores["rows"]}
+        rows = scores["features"] + scores["components"]
+        if rows:
+            values["max_psi"] = max(r["psi"] for r in rows)
+            values["max_ks"] = max(r["ks"] for r in rows)
+            if scores["rows"] >= MIN_ROWS:
+                values["alerts"] = sum(r["psi"] >= PSI_ALERT for r in rows)
+        return values
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_drift_monitor(pipeline):
+    """Moniteur du processus, réinitialisé quand la version du modèle change."""
+    global _monitor
+    monitor = _monitor
+    if monitor is not None and monitor.version == pipeline.version:
+        return monitor
+    with _monitor_lock:
+        if _monitor is None or _monitor.version != pipeline.version:
+            _monitor = DriftMonitor(load_feature_matrix(), transform=pipeline.transform, version=pipeline.version)
+            register_collector("drift", _monitor.stats)
+        return _monitor
+
+
+def current_drift_monitor():
+    """Moniteur déjà créé, ou None si aucune prédiction n'a encore été faite."""
+    return _monitor
+
+
+def close_drift_monitor():
+    """Oublie le moniteur du processus, qui retient ``pipeline.transform``."""
+    global _monitor
+    with _monitor_lock:
+        _monitor = None
+        unregister_collector("drift")
+
+
+def bench(rows=5_000_000, batch_size=1000, shift=0.0, seed=0):
+    """Flux synthétique tiré des données d'entraînement, éventuellement décalé."""
+    import resource
+    import time
+
+    from inference import get_pipeline
+
+    reference = load_feature_matrix()
+    monitor = DriftMonitor(reference, transform=get_pipeline().transform)
+    rng = np.random.default_rng(seed)
+    noise = reference.std(axis=0) * 0.05
+    rss = []
+    start = time.perf_counter()
+    for done in range(0, rows, batch_size):
+        n = min(batch_size, rows - done)
+        X = reference[rng.integers(0, len(reference), n)] + rng.normal(0, 1, (n, N_FEATURES)) * noise
+        X *= 1.0 + shift
+        monitor.update(np.abs(X))
+        if done % (rows // 10 or 1) < batch_size:
+            rss.append(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+    elapsed = time.perf_counter() - start
+    stats = monitor.stats()
+    return {
+        "rows": monitor.rows,
+        "batch_size": batch_size,
+        "seconds": elapsed,
+        "rows_per_s": monitor.rows / elapsed,
+        "peak_rss_mb": rss,
+        "max_psi": stats["max_psi"],
+        "max_ks": stats["max_ks"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Surveillance de dérive des entrées")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="Débit et mémoire sur un flux synthétique")
+    bench_parser.add_argument("--rows", type=int, default=5_000_000)
+    bench_parser.add_argument("--batch-size", type=int, default=1000)
+    bench_parser.add_argument("--shift", type=float, default=0.0,
+                              help="Décalage multiplicatif appliqué au flux (0.2 = +20 %%)")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(bench(args.rows, args.batch_size, args.shift), indent=2))
+
+
+if __name__ == "__main__":
+    main()
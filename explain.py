@@ -0,0 +1,134 @@
+"""Contributions de chaque caractéristique à la probabilité de malignité.
+
+Les contributions sont calculées analytiquement, sans permutation :
+
+1. dans l'espace PCA, chaque arbre attribue la variation de probabilité entre
+   un nœud et son enfant à la composante testée par ce nœud (décomposition
+   des chemins de décision) ; la probabilité prédite est exactement
+   ``baseline + somme des contributions des composantes`` ;
+2. la contribution d'une composante z_j = somme_i C_ji u_i est répartie sur
+   les 30 entrées au prorata de leur terme C_ji u_i, où
+   u = (x - centre) / échelle - moyenne PCA est l'entrée standardisée.
+
+La ligne de référence (contribution nulle) est donc la moyenne d'entraînement
+de la PCA. Tout est vectorisé sur le lot ; les tableaux dérivés du modèle sont
+préparés une fois par version.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from features import MALIGNANT_CLASS, N_FEATURES
+from inference import CHUNK_SIZE, pipeline_arrays
+from metrics import timed
+
+
+@dataclass
+class Explanation:
+    # None pour Explainer.contributions
+    proba: np.ndarray
+    # Probabilité de malignité moyenne des racines, commune à toutes les lignes
+    baseline: float
+    # (n, 30) : contributions des entrées à la probabilité de malignité
+    contributions: np.ndarray
+    # (n, k) : contributions des composantes PCA
+    component_contributions: np.ndarray
+
+    @property
+    def proba_malignant(self):
+        return self.baseline + self.component_contributions.sum(axis=1)
+
+
+class Explainer:
+    """Décompose les prédictions d'un pipeline compilé (forêt ou arbre seul)."""
+
+    def __init__(self, pipeline):
+        arrays = getattr(pipeline, "arrays", None)
+        if arrays is None:
+            # Chemin sklearn d'origine : mêmes tableaux que le pipeline compilé
+            arrays = pipeline_arrays(pipeline.scaler, pipeline.pca, pipeline.model)
+        if "tree_roots" not in arrays:
+            raise ValueError("Les contributions ne sont disponibles que pour les modèles à base d'arbres")
+        self.pipeline = pipeline
+        self.version = pipeline.version
+
+        malignant = int(np.flatnonzero(arrays["classes"] == MALIGNANT_CLASS)[0])
+        self._roots = arrays["tree_roots"]
+        self._children = arrays["tree_children"]
+        self._feature = arrays["tree_feature"]
+        self._threshold = arrays["tree_threshold"]
+        self._depth = int(arrays["tree_depth"])
+        self._value = np.ascontiguousarray(arrays["tree_value"][:, malignant], dtype=np.float64)
+        self.baseline = float(self._value[self._roots].mean())
+
+        self._center = arrays["scaler_center"]
+        self._scale = arrays["scaler_scale"]
+        self._mean = arrays["pca_mean"]
+        components = np.asarray(arrays["pca_components"], dtype=np.float64)
+        whiten = arrays.get("pca_whiten_scale")
+        if whiten is not None:
+            components = components / np.asarray(whiten)[:, np.newaxis]
+        self._components = components
+        self.n_components = components.shape[0]
+
+    def _component_contributions(self, projection):
+        n, k = projection.shape
+        n_trees = len(self._roots)
+        # Mêmes comparaisons que le parcours de CompiledPipeline (entrées en float32)
+        xt = np.ascontiguousarray(projection.astype(np.float32).T, dtype=np.float64).ravel()
+        cols = np.arange(n, dtype=np.intp)
+        rows = np.broadcast_to(cols * k, (n_trees, n))
+
+        node = np.repeat(self._roots[:, np.newaxis], n, axis=1)
+        out = np.zeros(n * k)
+        for _ in range(self._depth):
+            feat = self._feature[node]
+            go_right = xt[feat * n + cols] > self._threshold[node]
+            child = self._children[2 * node + go_right]
+            # Les feuilles bouclent sur elles-mêmes : leur écart est nul
+            out += np.bincount((rows + feat).ravel(), weights=(self._value[child] - self._value[node]).ravel(),
+                               minlength=n * k)
+            node = child
+        return out.reshape(n, k) / n_trees
+
+    def contributions(self, X):
+        """Contributions seules, sans appel au modèle : ``proba`` vaut None.
+
+        Pour un appelant qui a déjà la probabilité servie (mémo de prédiction).
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        with timed("explain"):
+            standardized = (X - self._center) / self._scale - self._mean
+            projection = standardized @ self._components.T
+            # Blocs bornés : les tableaux (arbres, lignes) du parcours restent en cache
+            phi = np.empty_like(projection)
+            for start in range(0, X.shape[0], CHUNK_SIZE):
+                phi[start:start + CHUNK_SIZE] = self._component_contributions(projection[start:start + CHUNK_SIZE])
+            # Répartition de chaque composante au prorata de C_ji u_i (z_j nul : rien à répartir)
+            ratio = np.divide(phi, projection, out=np.zeros_like(phi), where=projection != 0)
+            contributions = standardized * (ratio @ self._components)
+        return Explanation(proba=None, baseline=self.baseline, contributions=contributions,
+                           component_contributions=phi)
+
+    def explain(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        explanation = self.contributions(X)
+        explanation.proba = self.pipeline.predict_proba(X)
+        return explanation
+
+
+_explainer = None
+_explainer_lock = threading.Lock()
+
+
+def get_explainer(pipeline):
+    """Explicateur du processus, reconstruit quand la version du modèle change."""
+    global _explainer
+    explainer = _explainer
+    if explainer is not None and explainer.version == pipeline.version and explainer.pipeline is pipeline:
+        return explainer
+    with _explainer_lock:
+        if _explainer is None or _explainer.version != pipeline.version or _explainer.pipeline is not pipeline:
+            _explainer = Explainer(pipeline)
+        return _explainer
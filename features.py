@@ -0,0 +1,33 @@
+"""Schéma des 30 caractéristiques attendues par le modèle."""
+import csv
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = os.path.join(BASE_DIR, "wisc_bc_data.csv")
+
+# Les 30 colonnes dans l'ordre
+FEATURE_COLUMNS = [
+    "radius_mean", "texture_mean", "perimeter_mean", "area_mean", "smoothness_mean",
+    "compactness_mean", "concavity_mean", "concave points_mean", "symmetry_mean", "fractal_dimension_mean",
+    "radius_se", "texture_se", "perimeter_se", "area_se", "smoothness_se",
+    "compactness_se", "concavity_se", "concave points_se", "symmetry_se", "fractal_dimension_se",
+    "radius_worst", "texture_worst", "perimeter_worst", "area_worst", "smoothness_worst",
+    "compactness_worst", "concavity_worst", "concave points_worst", "symmetry_worst", "fractal_dimension_worst"
+]
+N_FEATURES = len(FEATURE_COLUMNS)
+
+# Classe prédite pour une tumeur maligne
+MALIGNANT_CLASS = 1
+CLASS_LABELS = {0: "B", 1: "M"}
+
+
+def load_feature_matrix(path=DATA_FILE):
+    """Lit les 30 colonnes d'un CSV au format wisc_bc_data.csv en matrice float64."""
+    import numpy as np
+
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        idx = [header.index(col) for col in FEATURE_COLUMNS]
+        rows = [[float(row[i]) for i in idx] for row in reader if row]
+    return np.array(rows, dtype=np.float64).reshape(-1, N_FEATURES)
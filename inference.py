@@ -0,0 +1,523 @@
+"""Pipeline d'inférence compilé : scaler + PCA + classifieur en un seul noyau.
+
+Au chargement, la moyenne/échelle du scaler sont repliées dans les composantes
+de la PCA pour obtenir une seule projection affine ``x @ W + b``. Les arbres de
+la forêt aléatoire sont aplatis dans des tableaux numpy parcourus de façon
+vectorisée, sans la validation sklearn appelée à chaque prédiction.
+
+Le pipeline peut aussi calculer en float32 ; ce mode n'est activé que s'il ne
+change aucune prédiction sur wisc_bc_data.csv (voir ``reduce_precision``).
+"""
+import os
+import threading
+import warnings
+
+import numpy as np
+
+from features import DATA_FILE, N_FEATURES, load_feature_matrix
+from metrics import muted, register_collector, timed
+
+# Taille maximale d'un bloc traité d'un coup : borne la mémoire de travail
+CHUNK_SIZE = 2048
+# Mémoïsation des prédictions : entrées gardées et décimales de la clé (%.4f)
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDCULTURE_PREDICTION_CACHE_SIZE", 4096))
+PREDICTION_CACHE_DECIMALS = 4
+# Au-delà, le parcours Cython de sklearn (s'il est disponible) est plus rapide
+# que le parcours numpy, dont l'intérêt est de supprimer le coût fixe par appel
+FOREST_MAX_ROWS = 128
+
+PRECISIONS = ("float64", "float32")
+PRECISION = os.environ.get("PREDCULTURE_PRECISION", "float64")
+
+
+class PrecisionGuardrailError(ValueError):
+    """Le mode de précision réduite change au moins une prédiction de référence."""
+
+
+def _scaler_arrays(scaler):
+    n = scaler.n_features_in_
+    # RobustScaler expose center_, StandardScaler expose mean_
+    center = getattr(scaler, "center_", None)
+    if center is None:
+        center = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    center = np.zeros(n) if center is None else np.asarray(center, dtype=np.float64)
+    scale = np.ones(n) if scale is None else np.asarray(scale, dtype=np.float64)
+    return center, scale
+
+
+def _forest_arrays(model):
+    """Aplatit les arbres d'une forêt (ou un arbre seul) en tableaux contigus.
+
+    Les feuilles pointent sur elles-mêmes : le parcours peut alors tourner un
+    nombre fixe d'itérations (la profondeur maximale) sans test d'arrêt.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        estimators = [model]
+    n_classes = len(model.classes_)
+
+    roots, children, feature, threshold, value = [], [], [], [], []
+    offset = 0
+    depth = 0
+    for est in estimators:
+        tree = est.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("Seuls les classifieurs à une sortie sont supportés")
+        idx = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        # Enfants entrelacés : enfant = children[2 * noeud + (x > seuil)]
+        left = np.where(is_leaf, idx, tree.children_left) + offset
+        right = np.where(is_leaf, idx, tree.children_right) + offset
+        children.append(np.stack([left, right], axis=1).ravel())
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        # Même normalisation que DecisionTreeClassifier.predict_proba
+        proba = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(proba / normalizer)
+        depth = max(depth, tree.max_depth)
+        offset += tree.node_count
+
+    return {
+        "tree_roots": np.asarray(roots, dtype=np.intp),
+        "tree_children": np.concatenate(children).astype(np.intp),
+        "tree_feature": np.concatenate(feature).astype(np.intp),
+        "tree_threshold": np.concatenate(threshold).astype(np.float64),
+        "tree_value": np.concatenate(value),
+        "tree_depth": np.asarray(depth, dtype=np.intp),
+    }
+
+
+def pipeline_arrays(scaler, pca, model):
+    """Extrait tous les paramètres numériques des estimateurs sklearn."""
+    center, scale = _scaler_arrays(scaler)
+    arrays = {
+        "scaler_center": center,
+        "scaler_scale": scale,
+        "pca_mean": np.asarray(pca.mean_, dtype=np.float64),
+        "pca_components": np.asarray(pca.components_, dtype=np.float64),
+        "classes": np.asarray(model.classes_),
+    }
+    if pca.whiten:
+        arrays["pca_whiten_scale"] = np.sqrt(pca.explained_variance_)
+    from sklearn.ensemble._forest import ForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(model, (ForestClassifier, DecisionTreeClassifier)):
+        arrays.update(_forest_arrays(model))
+    return arrays
+
+
+class _Buffers:
+    # Stockage préalloué pour ``capacity`` lignes au plus, partagé par les vues
+    def __init__(self, n_trees, capacity, k, dtype=np.float64):
+        self.n_trees = n_trees
+        self.capacity = capacity
+        self.k = k
+        self.projection = np.empty((capacity, k), dtype=dtype)
+        self.centered = np.empty((capacity, N_FEATURES), dtype=dtype)
+        self.x32 = np.empty((capacity, k), dtype=np.float32)
+        # Tableaux à plat : la vue (k, n) ou (arbres, n) reste contiguë pour tout n
+        self.xt = np.empty(k * capacity, dtype=np.float64)
+        self.node = np.empty(n_trees * capacity, dtype=np.intp)
+        self.feat = np.empty(n_trees * capacity, dtype=np.intp)
+        self.xv = np.empty(n_trees * capacity, dtype=np.float64)
+        self.thr = np.empty(n_trees * capacity, dtype=np.float64)
+        self.go_right = np.empty(n_trees * capacity, dtype=bool)
+        self.cols = np.arange(capacity, dtype=np.intp)
+
+
+class _Workspace:
+    # Vues de n lignes sur les tampons : aucune allocation quand n change
+    def __init__(self, buffers, n):
+        t, k = buffers.n_trees, buffers.k
+        self.n = n
+        self.buffers = buffers
+        self.projection = buffers.projection[:n]
+        self.centered = buffers.centered[:n]
+        self.x32 = buffers.x32[:n]
+        self.xt = buffers.xt[:k * n].reshape(k, n)
+        self.node = buffers.node[:t * n].reshape(t, n)
+        self.feat = buffers.feat[:t * n].reshape(t, n)
+        self.xv = buffers.xv[:t * n].reshape(t, n)
+        self.thr = buffers.thr[:t * n].reshape(t, n)
+        self.go_right = buffers.go_right[:t * n].reshape(t, n)
+        self.cols = buffers.cols[:n]
+
+
+class CompiledPipeline:
+    """Projection affine unique suivie du classifieur, sur tampons préalloués.
+
+    Avec ``fold=True`` le scaler est replié dans la PCA (un seul produit
+    matriciel). Avec ``fold=False`` la projection reprend l'ordre des
+    opérations de sklearn ; les produits matriciels ne passent pas par les
+    mêmes noyaux BLAS, d'où des écarts de l'ordre de 1e-15 sur la projection.
+    Les probabilités, elles, sont comparées exactement (``compile_artifacts``).
+
+    ``precision`` vaut "float64" (défaut) ou "float32" (entrées, projection et
+    probabilités des feuilles en float32).
+    """
+
+    def __init__(self, arrays, classifier=None, fold=True, version=None, precision="float64"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Précision inconnue : {precision}")
+        self.arrays = arrays
+        self.version = version
+        self.fold = fold
+        self.precision = precision
+        self.dtype = np.float64 if precision == "float64" else np.float32
+        self.classes = arrays["classes"]
+        self._classifier = classifier
+        self._local = threading.local()
+
+        center = arrays["scaler_center"]
+        scale = arrays["scaler_scale"]
+        mean = arrays["pca_mean"]
+        components = arrays["pca_components"]
+        whiten = arrays.get("pca_whiten_scale")
+        self.n_components = components.shape[0]
+
+        # Repli : ((x - c) / s - m) @ C.T = x @ (C / s).T - (c / s + m) @ C.T
+        weight = (components / scale).T
+        bias = -((center / scale + mean) @ components.T)
+        if whiten is not None:
+            weight = weight / whiten
+            bias = bias / whiten
+        self.weight = np.ascontiguousarray(weight, dtype=self.dtype)
+        self.bias = bias.astype(self.dtype)
+
+        dtype = self.dtype
+        self._center, self._scale, self._mean = center.astype(dtype), scale.astype(dtype), mean.astype(dtype)
+        self._components_t = np.ascontiguousarray(components.T, dtype=dtype)
+        self._whiten = None if whiten is None else whiten.astype(dtype)
+
+        self.has_forest = "tree_roots" in arrays
+        if self.has_forest:
+            self._roots = arrays["tree_roots"]
+            self._children = arrays["tree_children"]
+            self._feature = arrays["tree_feature"]
+            self._threshold = arrays["tree_threshold"]
+            self._value = arrays["tree_value"]
+            if self.dtype != self._value.dtype:
+                self._value = self._value.astype(self.dtype)
+            self._depth = int(arrays["tree_depth"])
+        elif classifier is None:
+            raise ValueError("Un classifieur est requis en l'absence de forêt compilée")
+
+    @classmethod
+    def from_estimators(cls, scaler, pca, model, fold=True, version=None):
+        arrays = pipeline_arrays(scaler, pca, model)
+        return cls(arrays, classifier=model, fold=fold, version=version)
+
+    def _workspace(self, n):
+        ws = getattr(self._local, "ws", None)
+        if ws is not None and ws.n == n:
+            return ws
+        buffers = ws.buffers if ws is not None else None
+        if buffers is None or buffers.capacity < n:
+            # Les tampons grandissent jusqu'au plus gros bloc vu (CHUNK_SIZE au plus)
+            n_trees = len(self._roots) if self.has_forest else 0
+            capacity = max(n, min(2 * buffers.capacity, CHUNK_SIZE)) if buffers is not None else n
+            buffers = _Buffers(n_trees, capacity, self.n_components, self.dtype)
+        ws = _Workspace(buffers, n)
+        self._local.ws = ws
+        return ws
+
+    def _project(self, X, ws):
+        out = ws.projection
+        if self.fold:
+            np.matmul(X, self.weight, out=out)
+            out += self.bias
+        else:
+            # Même séquence que RobustScaler.transform puis PCA.transform
+            buf = ws.centered
+            np.subtract(X, self._center, out=buf)
+            buf /= self._scale
+            buf -= self._mean
+            np.matmul(buf, self._components_t, out=out)
+            if self._whiten is not None:
+                out /= self._whiten
+        return out
+
+    def _forest_leaves(self, projection, ws):
+        # Les arbres sklearn comparent les entrées converties en float32
+        x32 = ws.x32
+        x32[...] = projection
+        xt = ws.xt
+        xt[...] = x32.T
+        flat = xt.ravel()
+        n = ws.n
+
+        node, feat = ws.node, ws.feat
+        node[...] = self._roots[:, np.newaxis]
+        for _ in range(self._depth):
+            np.take(self._feature, node, out=feat)
+            feat *= n
+            feat += ws.cols
+            np.take(flat, feat, out=ws.xv)
+            np.take(self._threshold, node, out=ws.thr)
+            np.greater(ws.xv, ws.thr, out=ws.go_right)
+            node *= 2
+            node += ws.go_right
+            np.take(self._children, node, out=feat)
+            node[...] = feat
+        return node
+
+    @staticmethod
+    def _as_matrix(X, dtype=np.float64):
+        X = np.asarray(X, dtype=dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != N_FEATURES:
+            raise ValueError(f"{N_FEATURES} caractéristiques attendues, {X.shape[1]} reçues")
+        return X
+
+    def transform(self, X):
+        """Projection dans l'espace PCA (équivalent de pca.transform(scaler.transform(X)))."""
+        X = self._as_matrix(X, self.dtype)
+        out = np.empty((X.shape[0], self.n_components), dtype=self.dtype)
+        for start in range(0, X.shape[0], CHUNK_SIZE):
+            chunk = X[start:start + CHUNK_SIZE]
+            out[start:start + chunk.shape[0]] = self._project(chunk, self._workspace(chunk.shape[0]))
+        return out
+
+    def predict_proba(self, X):
+        X = self._as_matrix(X, self.dtype)
+        if not self.has_forest or (self._classifier is not None and X.shape[0] > FOREST_MAX_ROWS):
+            # Gros lots : un seul appel sklearn, son coût fixe est alors amorti
+            with timed("projection"):
+                projection = self.transform(X)
+            with timed("classifier"):
+                return self._classifier.predict_proba(projection)
+
+        out = np.empty((X.shape[0], len(self.classes)), dtype=self.dtype)
+        for start in range(0, X.shape[0], CHUNK_SIZE):
+            chunk = X[start:start + CHUNK_SIZE]
+            ws = self._workspace(chunk.shape[0])
+            with timed("projection"):
+                projection = self._project(chunk, ws)
+            with timed("classifier"):
+                leaves = self._forest_leaves(projection, ws)
+                # Somme séquentielle arbre par arbre, comme RandomForestClassifier
+                proba = np.add.reduce(self._value[leaves], axis=0)
+                proba /= len(self._roots)
+            out[start:start + chunk.shape[0]] = proba
+        return out
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+class ReferencePipeline:
+    """Chemin sklearn d'origine en trois étapes : scaler, PCA, puis modèle."""
+
+    def __init__(self, scaler, pca, model, version=None):
+        self.scaler, self.pca, self.model = scaler, pca, model
+        self.version = version
+        self.classes = model.classes_
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        with timed("scaler_transform"):
+            scaled = self.scaler.transform(X)
+        with timed("pca_transform"):
+            return self.pca.transform(scaled)
+
+    def predict_proba(self, X):
+        projection = self.transform(X)
+        with timed("model_predict"):
+            return self.model.predict_proba(projection)
+
+    def predict(self, X):
+        projection = self.transform(X)
+        with timed("model_predict"):
+            return self.model.predict(projection)
+
+
+def verify(compiled, reference, X):
+    """Compare le pipeline compilé au chemin sklearn sur la matrice X.
+
+    Les mesures sont suspendues : ces appels ne servent aucune requête.
+    """
+    with muted():
+        labels = compiled.predict(X)
+        expected = reference.predict(X)
+        return {
+            "rows": int(X.shape[0]),
+            "label_mismatches": int(np.count_nonzero(labels != expected)),
+            "max_projection_diff": float(np.max(np.abs(compiled.transform(X) - reference.transform(X)))),
+            "max_proba_diff": float(np.max(np.abs(compiled.predict_proba(X) - reference.predict_proba(X)))),
+        }
+
+
+def reduce_precision(pipeline, precision, reference_data=DATA_FILE):
+    """Version du pipeline en précision réduite, validée sur wisc_bc_data.csv.
+
+    Les prédictions sont comparées au pipeline float64 par petits lots (parcours
+    numpy de la forêt) et d'un bloc (chemin des gros lots). Lève
+    ``PrecisionGuardrailError`` si une seule prédiction change, ``ValueError``
+    si le pipeline n'est pas compilé (le chemin sklearn reste en float64).
+    """
+    if not isinstance(pipeline, CompiledPipeline):
+        if precision == "float64":
+            return pipeline
+        raise ValueError(f"Le mode {precision} n'existe que pour le pipeline compilé (PREDCULTURE_COMPILED=1)")
+    if precision == pipeline.precision:
+        return pipeline
+    candidate = CompiledPipeline(pipeline.arrays, classifier=pipeline._classifier, fold=pipeline.fold,
+                                 version=pipeline.version, precision=precision)
+    X = load_feature_matrix(reference_data)
+    with muted():
+        expected = pipeline.predict(X)
+        small = np.concatenate([
+            candidate.predict(X[start:start + FOREST_MAX_ROWS]) for start in range(0, len(X), FOREST_MAX_ROWS)
+        ])
+        flips = int(np.count_nonzero(small != expected) + np.count_nonzero(candidate.predict(X) != expected))
+    if flips:
+        raise PrecisionGuardrailError(
+            f"Le mode {precision} change {flips} prédiction(s) sur {len(X)} lignes de référence : refusé"
+        )
+    return candidate
+
+
+def apply_precision(pipeline, precision=PRECISION):
+    """Applique la précision demandée, ou garde float64 si le garde-fou la refuse."""
+    if precision == "float64":
+        return pipeline
+    try:
+        return reduce_precision(pipeline, precision)
+    except PrecisionGuardrailError as e:
+        warnings.warn(f"{e} ; le pipeline reste en float64")
+        return pipeline
+
+
+def compile_artifacts(artifacts, reference_data=DATA_FILE):
+    """Compile les artefacts et vérifie le résultat sur wisc_bc_data.csv.
+
+    Les probabilités doivent être exactement celles du chemin sklearn : au
+    moindre écart, on revient à la projection non repliée ; si celle-ci
+    diffère encore, elle est gardée avec un avertissement.
+    """
+    scaler, pca, model = artifacts.scaler, artifacts.pca, artifacts.model
+    compiled = CompiledPipeline.from_estimators(scaler, pca, model, version=artifacts.version)
+    if reference_data is not None and os.path.exists(reference_data):
+        X = load_feature_matrix(reference_data)
+        reference = ReferencePipeline(scaler, pca, model, version=artifacts.version)
+        report = verify(compiled, reference, X)
+        if report["label_mismatches"] or report["max_proba_diff"]:
+            compiled = CompiledPipeline(compiled.arrays, classifier=compiled._classifier,
+                                        fold=False, version=artifacts.version)
+            report = verify(compiled, reference, X)
+            if report["label_mismatches"] or report["max_proba_diff"]:
+                warnings.warn(f"Le pipeline compilé diffère du chemin sklearn : {report}")
+    return compiled
+
+
+class PredictionMemo:
+    """Mémoïse les probabilités par vecteur d'entrée, pour une version du modèle.
+
+    Les entrées sont arrondies à ``decimals`` (le format %.4f du formulaire)
+    avant la prédiction : deux saisies identiques à l'écran partagent le même
+    résultat. Le cache est vidé dès que la version des artefacts change.
+    """
+
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE, decimals=PREDICTION_CACHE_DECIMALS):
+        from caching import LRUCache
+
+        self.decimals = decimals
+        self.cache = LRUCache(maxsize=maxsize)
+        self.version = None
+        self._lock = threading.Lock()
+
+    def predict_proba(self, pipeline, X):
+        X = CompiledPipeline._as_matrix(X)
+        if self.decimals is not None:
+            X = np.round(X, self.decimals)
+        if pipeline.version != self.version:
+            with self._lock:
+                if pipeline.version != self.version:
+                    self.cache.clear()
+                    self.version = pipeline.version
+
+        keys = [(pipeline.version, row.tobytes()) for row in X]
+        rows = [self.cache.get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            # Les lignes absentes du cache sont calculées en un seul lot
+            proba = pipeline.predict_proba(X[missing])
+            for i, p in zip(missing, proba):
+                rows[i] = p
+                self.cache.set(keys[i], p)
+        return np.array(rows)
+
+    def predict(self, pipeline, X):
+        proba = self.predict_proba(pipeline, X)
+        return pipeline.classes.take(np.argmax(proba, axis=1), axis=0)
+
+    def stats(self):
+        return {"version": self.version, **self.cache.stats()}
+
+
+_memo = None
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_prediction_memo():
+    global _memo
+    if _memo is None:
+        with _pipeline_lock:
+            if _memo is None:
+                _memo = PredictionMemo()
+                register_collector("prediction_memo", _memo.stats)
+    return _memo
+
+
+def get_pipeline():
+    """Pipeline de prédiction du processus, recompilé quand les artefacts changent.
+
+    ``PREDCULTURE_COMPILED=0`` force le chemin sklearn d'origine.
+    ``PREDCULTURE_COMPACT_MODEL`` sert un modèle au format compact (compact.py)
+    au lieu des fichiers pickle.
+    """
+    global _pipeline
+    compact_path = os.environ.get("PREDCULTURE_COMPACT_MODEL")
+    if compact_path:
+        from compact import get_compact_pipeline
+
+        return get_compact_pipeline(compact_path)
+
+    from artifacts import load_artifacts
+
+    artifacts = load_artifacts()
+    pipeline = _pipeline
+    if pipeline is not None and pipeline.version == artifacts.version:
+        return pipeline
+    with _pipeline_lock:
+        if _pipeline is None or _pipeline.version != artifacts.version:
+            if os.environ.get("PREDCULTURE_COMPILED", "1") == "0":
+                _pipeline = ReferencePipeline(artifacts.scaler, artifacts.pca, artifacts.model,
+                                              version=artifacts.version)
+            else:
+                _pipeline = apply_precision(compile_artifacts(artifacts))
+        return _pipeline
+
+
+if __name__ == "__main__":
+    import sys
+
+    from artifacts import load_artifacts
+
+    artifacts = load_artifacts()
+    X = load_feature_matrix()
+    reference = ReferencePipeline(artifacts.scaler, artifacts.pca, artifacts.model)
+    failed = False
+    for fold in (True, False):
+        compiled = CompiledPipeline.from_estimators(artifacts.scaler, artifacts.pca, artifacts.model, fold=fold)
+        report = verify(compiled, reference, X)
+        print(f"fold={fold}: {report}")
+        failed = failed or report["label_mismatches"] > 0 or (not fold and report["max_proba_diff"] > 0)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,80 @@
+"""Générateur de charge local pour le serveur de prédiction (server.py).
+
+    python loadgen.py --url http://127.0.0.1:8000/predict --concurrency 64 --requests 20000
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from features import load_feature_matrix
+
+
+def _client(url, bodies, count, latencies, errors):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+    headers = {"Content-Type": "application/json"}
+    for _ in range(count):
+        body = random.choice(bodies)
+        start = time.perf_counter()
+        try:
+            conn.request("POST", parsed.path, body, headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(url, concurrency=64, requests=20000):
+    X = load_feature_matrix()
+    bodies = [json.dumps({"features": row.tolist()}) for row in X]
+    latencies, errors = [], []
+    per_client = max(1, requests // concurrency)
+    threads = [
+        threading.Thread(target=_client, args=(url, bodies, per_client, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    lat = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else None,
+        "p99_ms": float(np.percentile(lat, 99)) if len(lat) else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Générateur de charge pour /predict")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/predict")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    report = run(args.url, args.concurrency, args.requests)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
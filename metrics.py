@@ -0,0 +1,182 @@
+"""Instrumentation légère : durée de chaque étape en histogrammes glissants.
+
+Chaque étape (chargement des artefacts, formulaire, projection, classifieur,
+rendu, appel au chat...) est chronométrée avec ``timed("étape")``. Les mesures
+alimentent des histogrammes à seaux fixes, exposés au format texte Prometheus
+(``render_prometheus``) et résumés dans le panneau d'administration.
+
+Le coût d'une mesure est d'environ une microseconde : deux lectures d'horloge,
+une recherche dichotomique et un verrou.
+"""
+import bisect
+import contextlib
+import threading
+import time
+
+# Bornes des seaux en secondes, de 1 µs à 30 s (échelle 1-2.5-5)
+BUCKETS = tuple(m * 10.0 ** e for e in range(-6, 2) for m in (1, 2.5, 5) if m * 10.0 ** e < 30) + (30.0,)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Estimation d'un quantile par interpolation linéaire dans son seau."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        target = q * total
+        cumulative = 0
+        for i, c in enumerate(counts):
+            if c and cumulative + c >= target:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - cumulative) / c
+            cumulative += c
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    def __init__(self, namespace="predculture"):
+        self.namespace = namespace
+        self._histograms = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def histogram(self, stage):
+        hist = self._histograms.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(stage, Histogram())
+        return hist
+
+    def timed(self, stage):
+        if getattr(self._local, "muted", False):
+            return _NULL_TIMER
+        return _Timer(self.histogram(stage))
+
+    def observe(self, stage, seconds):
+        if not getattr(self._local, "muted", False):
+            self.histogram(stage).observe(seconds)
+
+    @contextlib.contextmanager
+    def muted(self):
+        """Suspend les mesures du thread courant (vérifications internes, hors service)."""
+        previous = getattr(self._local, "muted", False)
+        self._local.muted = True
+        try:
+            yield
+        finally:
+            self._local.muted = previous
+
+    def register_collector(self, name, fn):
+        """Ajoute des jauges calculées à la lecture : ``fn()`` renvoie {nom: valeur}."""
+        self._collectors[name] = fn
+
+    def unregister_collector(self, name):
+        self._collectors.pop(name, None)
+
+    def summary(self):
+        rows = []
+        for stage, hist in sorted(self._histograms.items()):
+            _, total, count = hist.snapshot()
+            rows.append({
+                "stage": stage,
+                "count": count,
+                "mean_ms": total / count * 1000 if count else None,
+                "p50_ms": (hist.quantile(0.5) or 0) * 1000,
+                "p99_ms": (hist.quantile(0.99) or 0) * 1000,
+            })
+        return rows
+
+    def gauges(self):
+        values = {}
+        for name, fn in list(self._collectors.items()):
+            try:
+                for key, value in fn().items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        values[name, key] = value
+            except Exception:
+                # Un collecteur défaillant ne doit pas casser l'export
+                continue
+        return values
+
+    def render_prometheus(self):
+        ns = self.namespace
+        lines = [
+            f"# HELP {ns}_stage_seconds Durée de chaque étape du traitement d'une requête.",
+            f"# TYPE {ns}_stage_seconds histogram",
+        ]
+        for stage, hist in sorted(self._histograms.items()):
+            counts, total, count = hist.snapshot()
+            cumulative = 0
+            for bound, c in zip(hist.buckets, counts):
+                cumulative += c
+                lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{ns}_stage_seconds_sum{{stage="{stage}"}} {total:.9g}')
+            lines.append(f'{ns}_stage_seconds_count{{stage="{stage}"}} {count}')
+        # Une famille par collecteur (predculture_drift, predculture_audit…) :
+        # les alertes de dérive ne se confondent pas avec les statistiques de cache
+        previous = None
+        for (name, key), value in sorted(self.gauges().items()):
+            if name != previous:
+                lines.append(f"# TYPE {ns}_{name} gauge")
+                previous = name
+            lines.append(f'{ns}_{name}{{stat="{key}"}} {value:.9g}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+timed = REGISTRY.timed
+observe = REGISTRY.observe
+muted = REGISTRY.muted
+register_collector = REGISTRY.register_collector
+unregister_collector = REGISTRY.unregister_collector
+render_prometheus = REGISTRY.render_prometheus
@@ -0,0 +1,78 @@
+"""Profil du temps d'import au démarrage de l'application (python -X importtime).
+
+Lance l'import du module dans un interpréteur neuf, affiche les paquets les
+plus coûteux et échoue si une dépendance lourde est chargée au démarrage :
+elles doivent rester importées à la demande, dans la page qui les utilise.
+
+    python profile_imports.py
+    python profile_imports.py --module app_projet --budget-ms 800
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Paquets qui ne doivent pas être chargés par la page d'accueil
+HEAVY_PACKAGES = ("numpy", "pandas", "matplotlib", "seaborn", "sklearn", "joblib", "mistralai", "pyarrow")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile(module):
+    """Retourne [(module, temps propre µs, temps cumulé µs, profondeur)] pour l'import du module."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import de {module} impossible :\n{proc.stderr[-2000:]}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def heavy_imports(entries):
+    """Paquets de HEAVY_PACKAGES présents dans un profil d'import."""
+    return sorted({name.split(".")[0] for name, *_ in entries} & set(HEAVY_PACKAGES))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profil des imports au démarrage")
+    parser.add_argument("--module", default="app_projet")
+    parser.add_argument("--budget-ms", type=float, help="Échoue si l'import total dépasse ce budget")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    entries = profile(args.module)
+    total_ms = next(cum for name, _, cum, _ in entries if name == args.module) / 1000
+
+    # Temps propre additionné par paquet de premier niveau
+    packages = {}
+    for name, self_us, _, _ in entries:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    print(f"Import de {args.module} : {total_ms:.1f} ms")
+    for root, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {root}")
+
+    loaded = heavy_imports(entries)
+    failed = False
+    if loaded:
+        print(f"ÉCHEC : dépendances lourdes importées au démarrage : {', '.join(loaded)}")
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"ÉCHEC : {total_ms:.1f} ms > budget de {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""Rendu du graphique de résultat, calculé une seule fois par classe.
+
+Le graphique ne dépend que de la classe prédite : les deux images (bénin et
+malin) sont rendues au premier besoin puis servies depuis le cache. La figure
+est créée sans pyplot, elle n'est donc jamais retenue par le gestionnaire de
+figures global et la mémoire reste stable dans un serveur de longue durée.
+"""
+import io
+from functools import lru_cache
+
+BENIGN_COLOR = '#4CAF50'
+MALIGNANT_COLOR = '#F44336'
+
+
+@lru_cache(maxsize=2)
+def result_chart_png(malignant):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    ax.barh(['Résultat'], [1], color=[MALIGNANT_COLOR if malignant else BENIGN_COLOR])
+    ax.set_xlim(0, 1)
+    ax.set_xticks([])
+    ax.text(0.5, 0, 'Malin' if malignant else 'Bénin',
+            ha='center', va='center', color='white', fontsize=12)
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    return buf.getvalue()
@@ -0,0 +1,269 @@
+"""Serveur HTTP d'inférence sans interface, avec regroupement des requêtes.
+
+Les requêtes concurrentes d'une seule ligne sont regroupées en un seul lot
+numpy pendant une courte fenêtre de latence, puis classées d'un coup par un
+pool de workers dimensionné sur le nombre de cœurs.
+
+    python server.py --port 8000 --batch-window-ms 2
+    curl -X POST localhost:8000/predict -d '{"features": [17.99, 10.38, ...]}'
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from features import CLASS_LABELS, FEATURE_COLUMNS, MALIGNANT_CLASS, N_FEATURES
+from inference import get_pipeline
+from audit import close_audit_log, get_audit_log
+from drift import get_drift_monitor
+from metrics import render_prometheus, timed
+from validation import get_validator
+
+
+class MicroBatcher:
+    """Regroupe les demandes de prédiction reçues dans une fenêtre de latence."""
+
+    def __init__(self, get_pipeline=get_pipeline, max_batch_size=256, max_latency=0.002, workers=None):
+        self.get_pipeline = get_pipeline
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue = queue.Queue()
+        self._threads = []
+        self._closed = False
+        for i in range(workers or os.cpu_count() or 1):
+            thread = threading.Thread(target=self._run, name=f"batcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, X):
+        """Ajoute des lignes (n, 30) à la file ; le Future reçoit (pipeline, probabilités)."""
+        if self._closed:
+            raise RuntimeError("Le regroupeur est arrêté")
+        future = Future()
+        self._queue.put((np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES), future))
+        return future
+
+    def _collect(self):
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        rows = item[0].shape[0]
+        deadline = time.perf_counter() + self.max_latency
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Propage l'arrêt aux autres workers après ce dernier lot
+                self._queue.put(None)
+                break
+            batch.append(item)
+            rows += item[0].shape[0]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                self._queue.put(None)
+                return
+            futures = [future for _, future in batch]
+            try:
+                pipeline = self.get_pipeline()
+                proba = pipeline.predict_proba(np.vstack([X for X, _ in batch]))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for X, future in batch:
+                future.set_result((pipeline, proba[start:start + X.shape[0]]))
+                start += X.shape[0]
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def parse_instances(payload):
+    """Accepte {"features": [...]}, {"features": {colonne: valeur}} ou {"instances": [...]}."""
+    if "instances" in payload:
+        instances = payload["instances"]
+    elif "features" in payload:
+        instances = [payload["features"]]
+    else:
+        raise ValueError("Champ 'features' ou 'instances' attendu")
+    rows = []
+    for instance in instances:
+        if isinstance(instance, dict):
+            missing = [col for col in FEATURE_COLUMNS if col not in instance]
+            if missing:
+                raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+            instance = [instance[col] for col in FEATURE_COLUMNS]
+        if len(instance) != N_FEATURES:
+            raise ValueError(f"{N_FEATURES} caractéristiques attendues, {len(instance)} reçues")
+        rows.append(instance)
+    return np.array(rows, dtype=np.float64).reshape(-1, N_FEATURES)
+
+
+def format_predictions(pipeline, proba, report=None):
+    malignant = int(np.flatnonzero(pipeline.classes == MALIGNANT_CLASS)[0])
+    predictions = pipeline.classes.take(np.argmax(proba, axis=1))
+    results = [
+        {
+            "prediction": int(p),
+            "diagnosis": CLASS_LABELS.get(int(p), str(p)),
+            "probability_malignant": float(row[malignant]),
+        }
+        for p, row in zip(predictions, proba)
+    ]
+    if report is not None:
+        for i in np.flatnonzero(report.status):
+            results[i]["warnings"] = report.describe(i)
+    return results
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    # Connexions persistantes : le générateur de charge réutilise ses sockets
+    protocol_version = "HTTP/1.1"
+    # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, Nagle et
+    # l'ACK différé du client retardent chaque réponse d'environ 40 ms
+    disable_nagle_algorithm = True
+    batcher = None
+    request_timeout = 10.0
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, body):
+        self._send(status, json.dumps(body).encode(), "application/json")
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send(200, render_prometheus().encode(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._send_json(404, {"error": "Ressource inconnue"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": "Ressource inconnue"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            X = parse_instances(json.loads(self.rfile.read(length)))
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        started = time.perf_counter()
+        audit_log = get_audit_log()
+        report = get_validator().validate(X)
+        if report.n_rejected:
+            if audit_log is not None:
+                audit_log.record(X, np.full(X.shape[0], np.nan), np.full(X.shape[0], -1),
+                                 self.batcher.get_pipeline().version,
+                                 time.perf_counter() - started, "http", report.status)
+            # Lignes hors de toute plage plausible : rien n'est envoyé au modèle
+            self._send_json(422, {"error": "Valeurs rejetées", "rejected": {
+                int(i): report.describe(i) for i in np.flatnonzero(~report.accepted)
+            }})
+            return
+        try:
+            # Attente dans la file du regroupeur comprise
+            with timed("http_predict"):
+                pipeline, proba = self.batcher.submit(X).result(timeout=self.request_timeout)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        if audit_log is not None:
+            malignant = int(np.flatnonzero(pipeline.classes == MALIGNANT_CLASS)[0])
+            audit_log.record(X, proba[:, malignant], pipeline.classes.take(np.argmax(proba, axis=1)),
+                             pipeline.version, time.perf_counter() - started, "http", report.status)
+        self._send_json(200, {
+            "model_version": pipeline.version,
+            "predictions": format_predictions(pipeline, proba, report),
+        })
+        # Après la réponse : la mise à jour des résumés n'allonge pas la latence
+        get_drift_monitor(pipeline).update(X)
+
+    def log_message(self, format, *args):
+        # Pas de journal par requête : il coûte plus cher que la prédiction
+        pass
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # La file d'attente par défaut (5) refuse des connexions sous forte concurrence
+    request_queue_size = 1024
+
+
+def make_server(host="127.0.0.1", port=8000, batcher=None, sock=None):
+    """Crée le serveur ; ``sock`` permet de servir une socket déjà ouverte (multi-processus)."""
+    handler = type("Handler", (PredictionHandler,), {"batcher": batcher or MicroBatcher()})
+    if sock is None:
+        return PredictionServer((host, port), handler)
+    server = PredictionServer(sock.getsockname(), handler, bind_and_activate=False)
+    server.socket = sock
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur HTTP de prédiction PRedCulture")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--batch-window-ms", type=float, default=2.0,
+                        help="Fenêtre de regroupement des requêtes (ms)")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Nombre de workers de prédiction (défaut : nombre de cœurs)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Processus serveurs partageant le modèle en mémoire partagée")
+    args = parser.parse_args(argv)
+
+    if args.processes > 1:
+        from shm_serving import serve
+
+        serve(args.processes, args.host, args.port, threads=args.workers,
+              max_latency=args.batch_window_ms / 1000, max_batch_size=args.max_batch)
+        return
+
+    # Compile le pipeline avant d'accepter la première requête
+    get_pipeline()
+    batcher = MicroBatcher(max_batch_size=args.max_batch, max_latency=args.batch_window_ms / 1000,
+                           workers=args.workers)
+    server = make_server(args.host, args.port, batcher)
+    print(f"Serveur de prédiction sur http://{args.host}:{args.port}/predict")
+    # SIGTERM ferme aussi proprement le segment d'audit en cours
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        close_audit_log()
+
+
+if __name__ == "__main__":
+    main()
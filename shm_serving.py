@@ -0,0 +1,248 @@
+"""Service multi-processus avec les poids du modèle en mémoire partagée.
+
+Le processus parent charge les artefacts une seule fois, puis copie les
+tableaux du pipeline compilé (au format compact, voir compact.py) dans un bloc
+``multiprocessing.shared_memory``. Les workers, créés par fork, s'y attachent
+et n'en font que des vues en lecture seule : la mémoire du modèle n'est plus
+multipliée par le nombre de workers.
+
+    python server.py --processes 4            # service HTTP multi-processus
+    python shm_serving.py bench --max-workers 8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import signal
+import socket
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import compact
+
+
+class SharedModel:
+    """Bloc de mémoire partagée contenant un pipeline au format compact."""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self._pipeline = None
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, pipeline):
+        data = compact.encode(pipeline)
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 : les workers forkés partagent le resource_tracker du
+            # parent, où le bloc est déjà enregistré ; seul le parent le détruit
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    def pipeline(self):
+        if self._pipeline is None:
+            self._pipeline = compact.from_buffer(self.shm.buf)
+        return self._pipeline
+
+    def close(self):
+        # Les vues numpy doivent disparaître avant la fermeture du bloc
+        self._pipeline = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _load_pipeline():
+    from inference import get_pipeline
+
+    return get_pipeline()
+
+
+def _serve_worker(name, sock, threads, max_latency, max_batch_size):
+    from server import MicroBatcher, make_server
+
+    shared = SharedModel.attach(name)
+    pipeline = shared.pipeline()
+    batcher = MicroBatcher(get_pipeline=lambda: pipeline, max_batch_size=max_batch_size,
+                           max_latency=max_latency, workers=threads)
+    server = make_server(batcher=batcher, sock=sock)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        from audit import close_audit_log
+        from drift import close_drift_monitor
+
+        # Un second SIGTERM (arrêt des processus démons du parent) interromprait le nettoyage
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        batcher.close()
+        close_audit_log()
+        server.server_close()
+        # Toute référence au pipeline retient des vues sur le bloc partagé
+        server.RequestHandlerClass.batcher = None
+        close_drift_monitor()
+        del pipeline, batcher, server
+        try:
+            shared.close()
+        except BufferError:
+            # Vue encore tenue par une requête interrompue : le parent détruit le bloc
+            pass
+
+
+def serve(processes, host="127.0.0.1", port=8000, threads=None, max_latency=0.002, max_batch_size=256):
+    """Sert /predict depuis ``processes`` workers forkés qui partagent la socket et le modèle."""
+    shared = SharedModel.create(_load_pipeline())
+    # SIGTERM (arrêt du conteneur) passe aussi par le nettoyage du bloc partagé
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    sock = socket.create_server((host, port), backlog=1024)
+    ctx = mp.get_context("fork")
+    workers = [
+        ctx.Process(target=_serve_worker, args=(shared.name, sock, threads, max_latency, max_batch_size),
+                    daemon=True)
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    print(f"Serveur de prédiction sur http://{host}:{port}/predict ({processes} processus)")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        # Les workers lâchent leurs vues avant que le bloc soit détruit
+        for worker in workers:
+            worker.join()
+        sock.close()
+        shared.close()
+
+
+def memory_usage_mb():
+    """RSS, PSS et USS (pages privées) du processus courant, en Mio."""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    usage[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        import resource
+
+        return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    return {
+        "rss": usage["Rss"],
+        "pss": usage["Pss"],
+        "uss": usage["Private_Clean"] + usage["Private_Dirty"],
+    }
+
+
+def _bench_worker(mode, name, X, duration, start, results):
+    shared = None
+    if mode == "shm":
+        shared = SharedModel.attach(name)
+        pipeline = shared.pipeline()
+    else:
+        # Référence : chaque worker désérialise sa propre copie des artefacts
+        from artifacts import ArtifactRegistry
+        from inference import CompiledPipeline
+
+        a = ArtifactRegistry().get()
+        pipeline = CompiledPipeline.from_estimators(a.scaler, a.pca, a.model)
+    pipeline.predict(X)
+    start.wait()
+    rows = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        pipeline.predict(X)
+        rows += X.shape[0]
+    results.put({"rows_per_s": rows / duration, **memory_usage_mb()})
+    if shared is not None:
+        del pipeline
+        shared.close()
+
+
+def bench(max_workers=None, duration=2.0, batch_size=1, modes=("pickle", "shm")):
+    """Mémoire par worker et débit total selon le nombre de workers et le mode de chargement."""
+    from features import load_feature_matrix
+
+    # Modules importés avant le fork dans les deux modes : seule la donnée du modèle diffère
+    import sklearn.ensemble  # noqa: F401
+
+    X = load_feature_matrix()[:batch_size]
+    max_workers = max_workers or os.cpu_count()
+    counts = sorted({1, 2, 4, 8, 16, max_workers} & set(range(1, max_workers + 1)))
+    ctx = mp.get_context("fork")
+    shared = SharedModel.create(_load_pipeline()) if "shm" in modes else None
+
+    report = []
+    try:
+        for mode in modes:
+            for n in counts:
+                start, results = ctx.Event(), ctx.Queue()
+                workers = [
+                    ctx.Process(target=_bench_worker,
+                                args=(mode, shared.name if shared else None, X, duration, start, results))
+                    for _ in range(n)
+                ]
+                for worker in workers:
+                    worker.start()
+                start.set()
+                stats = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+                row = {
+                    "mode": mode,
+                    "workers": n,
+                    "rows_per_s": sum(s["rows_per_s"] for s in stats),
+                    **{f"{k}_mb_per_worker": float(np.mean([s[k] for s in stats])) for k in stats[0] if k != "rows_per_s"},
+                }
+                report.append(row)
+                print(json.dumps(row), file=sys.stderr)
+    finally:
+        if shared is not None:
+            shared.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service multi-processus à mémoire partagée")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve")
+    serve_parser.add_argument("--processes", type=int, default=os.cpu_count())
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    bench_parser = sub.add_parser("bench")
+    bench_parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    bench_parser.add_argument("--duration", type=float, default=2.0)
+    bench_parser.add_argument("--batch-size", type=int, default=1)
+    bench_parser.add_argument("--output", default="bench_shm.json")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.processes, args.host, args.port)
+    else:
+        report = bench(args.max_workers, args.duration, args.batch_size)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
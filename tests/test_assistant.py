@@ -0,0 +1,51 @@
+"""Backend de l'assistant contre le serveur factice chat_stub.py."""
+import threading
+
+import pytest
+
+from assistant import ChatBackend, estimate_tokens, history_window
+from caching import LRUCache
+from chat_stub import make_server
+
+
+@pytest.fixture
+def stub():
+    server = make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def backend(stub):
+    backend = ChatBackend(api_key="stub", endpoint=stub, history_budget=50, cache=LRUCache())
+    yield backend
+    backend.close()
+
+
+def test_reply_streams_in_several_chunks(backend):
+    chunks = list(backend.stream([{"role": "user", "content": "Quels sont les facteurs de risque ?"}]))
+    assert len(chunks) > 1
+    assert "".join(chunks).endswith("Quels sont les facteurs de risque ?")
+
+
+def test_history_is_trimmed_to_budget(backend):
+    messages = [{"role": "user" if i % 2 else "assistant", "content": "x" * 80} for i in range(20)]
+    messages.append({"role": "user", "content": "Et ensuite ?"})
+    window = history_window(messages, budget=50)
+    assert window[-1] == messages[-1]
+    assert sum(estimate_tokens(m["content"]) for m in window) <= 50
+    # Le serveur factice indique le nombre de messages reçus
+    reply = backend.complete(messages)
+    assert reply.startswith(f"Réponse simulée ({len(window)} messages reçus)")
+    assert len(window) < len(messages)
+
+
+def test_repeated_question_is_served_from_cache(backend):
+    question = [{"role": "user", "content": "Qu'est-ce qu'une tumeur bénigne ?"}]
+    first = backend.complete(question)
+    chunks = list(backend.stream([{"role": "user", "content": "qu'est-ce qu'une tumeur   bénigne"}]))
+    assert chunks == [first]
+    assert backend.cache.stats()["hits"] == 1
@@ -0,0 +1,57 @@
+"""Cache LRU : expiration, éviction et persistance SQLite."""
+from caching import LRUCache, SqliteBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now += 9
+    assert cache.get("a") == 1
+    clock.now += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    clock = FakeClock()
+    backend = SqliteBackend(path)
+    LRUCache(ttl=60, backend=backend, clock=clock).set("question", {"reponse": "texte"})
+    backend.close()
+
+    backend = SqliteBackend(path)
+    cache = LRUCache(ttl=60, backend=backend, clock=clock)
+    assert cache.get("question") == {"reponse": "texte"}
+    # Entrée expirée : ni la mémoire ni le disque ne la rendent
+    clock.now += 61
+    assert cache.get("question") is None
+    assert LRUCache(ttl=60, backend=backend, clock=clock).get("question") is None
+    backend.close()
+
+
+def test_sqlite_backend_purges_beyond_maxsize(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "cache.db"), maxsize=2)
+    for key in ("a", "b", "c"):
+        backend.set(key, key, None)
+    assert sum(backend.get(key, 0) is not None for key in ("a", "b", "c")) == 2
+    backend.close()
@@ -0,0 +1,6 @@
+"""La page d'accueil ne doit charger aucune dépendance lourde au démarrage."""
+from profile_imports import heavy_imports, profile
+
+
+def test_app_startup_skips_heavy_packages():
+    assert heavy_imports(profile("app_projet")) == []
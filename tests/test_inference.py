@@ -0,0 +1,48 @@
+"""Le pipeline compilé doit servir exactement les probabilités du chemin sklearn."""
+import numpy as np
+import pytest
+
+from artifacts import load_artifacts
+from features import load_feature_matrix
+from inference import (FOREST_MAX_ROWS, CompiledPipeline, ReferencePipeline, compile_artifacts,
+                       reduce_precision, verify)
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    return load_artifacts()
+
+
+@pytest.fixture(scope="module")
+def X():
+    return load_feature_matrix()
+
+
+@pytest.fixture(scope="module")
+def reference(artifacts):
+    return ReferencePipeline(artifacts.scaler, artifacts.pca, artifacts.model)
+
+
+@pytest.mark.parametrize("fold", [True, False])
+def test_compiled_matches_sklearn(artifacts, reference, X, fold):
+    compiled = CompiledPipeline.from_estimators(artifacts.scaler, artifacts.pca, artifacts.model, fold=fold)
+    report = verify(compiled, reference, X)
+    assert report["label_mismatches"] == 0
+    assert report["max_proba_diff"] == 0.0
+    # Seuls les noyaux BLAS diffèrent : quelques ulp sur la projection
+    assert report["max_projection_diff"] < 1e-12
+
+
+def test_small_batches_match_sklearn(artifacts, reference, X):
+    # En deçà de FOREST_MAX_ROWS, la forêt est parcourue en numpy
+    compiled = compile_artifacts(artifacts)
+    for start in range(0, len(X), FOREST_MAX_ROWS):
+        chunk = X[start:start + FOREST_MAX_ROWS]
+        np.testing.assert_array_equal(compiled.predict_proba(chunk), reference.predict_proba(chunk))
+    np.testing.assert_array_equal(compiled.predict_proba(X[:1]), reference.predict_proba(X[:1]))
+
+
+def test_reduced_precision_requires_compiled_pipeline(reference):
+    assert reduce_precision(reference, "float64") is reference
+    with pytest.raises(ValueError):
+        reduce_precision(reference, "float32")
@@ -0,0 +1,236 @@
+"""Réentraînement reproductible de model.pkl, scaler.pkl et pca.pkl.
+
+Charge wisc_bc_data.csv, ajuste RobustScaler -> PCA -> RandomForest et
+recherche les hyperparamètres par validation croisée. Chaque couple
+(paramètres, pli) est évalué en parallèle dans un pool de processus, et son
+score est mis en cache sur disque : une nouvelle exécution ne recalcule que
+les combinaisons nouvelles. Les artefacts sont écrits dans un répertoire
+versionné avec un manifeste (empreintes, ordre des colonnes, métriques).
+
+    python train.py                 # models/<version>/ + manifest.json
+    python train.py --install       # remplace aussi les .pkl servis par l'application
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from artifacts import (ARTIFACT_FILES, BASE_DIR, MANIFEST_FILE, MODEL_FILE, PCA_FILE, SCALER_FILE, Artifacts,
+                       artifacts_version, file_digest)
+from compact import COMPACT_FILE, export_compact
+from features import DATA_FILE, FEATURE_COLUMNS, MALIGNANT_CLASS
+from inference import compile_artifacts
+from validation import STATS_FILE, write_feature_stats
+
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+CACHE_DIR = os.path.join(BASE_DIR, ".train_cache")
+
+RANDOM_STATE = 42
+N_SPLITS = 5
+SCORING = ("roc_auc", "accuracy", "f1")
+
+# Grille de recherche ; les valeurs actuellement servies en font partie
+PARAM_GRID = {
+    "pca__n_components": [2, 3, 5, 10],
+    "clf__n_estimators": [100, 200],
+    "clf__min_samples_split": [2, 5],
+    "clf__max_depth": [None, 10],
+}
+
+
+def load_dataset(path=DATA_FILE):
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    X = np.array([[float(row[col]) for col in FEATURE_COLUMNS] for row in rows])
+    y = np.array([MALIGNANT_CLASS if row["diagnosis"] == "M" else 1 - MALIGNANT_CLASS for row in rows])
+    return X, y
+
+
+def make_pipeline(params):
+    from sklearn.decomposition import PCA
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import RobustScaler
+
+    pipeline = Pipeline([
+        ("scaler", RobustScaler()),
+        ("pca", PCA(random_state=RANDOM_STATE)),
+        # Un seul cœur par modèle : le parallélisme est porté par le pool de processus
+        ("clf", RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1)),
+    ])
+    return pipeline.set_params(**params)
+
+
+def param_candidates(grid=PARAM_GRID):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _task_key(data_hash, params, fold):
+    import sklearn
+
+    payload = json.dumps([data_hash, params, fold, N_SPLITS, RANDOM_STATE, sklearn.__version__], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _evaluate(X, y, params, train_idx, test_idx):
+    from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+
+    start = time.perf_counter()
+    pipeline = make_pipeline(params).fit(X[train_idx], y[train_idx])
+    proba = pipeline.predict_proba(X[test_idx])[:, list(pipeline.classes_).index(MALIGNANT_CLASS)]
+    pred = pipeline.predict(X[test_idx])
+    return {
+        "roc_auc": float(roc_auc_score(y[test_idx] == MALIGNANT_CLASS, proba)),
+        "accuracy": float(accuracy_score(y[test_idx], pred)),
+        "f1": float(f1_score(y[test_idx], pred, pos_label=MALIGNANT_CLASS)),
+        "fit_seconds": time.perf_counter() - start,
+    }
+
+
+def cross_validate(X, y, candidates, data_hash, workers=None, cache_dir=CACHE_DIR):
+    """Score de chaque candidat sur chaque pli ; les plis déjà calculés viennent du cache."""
+    from sklearn.model_selection import StratifiedKFold
+
+    os.makedirs(cache_dir, exist_ok=True)
+    folds = list(StratifiedKFold(N_SPLITS, shuffle=True, random_state=RANDOM_STATE).split(X, y))
+    scores = {}
+    pending = []
+    for c, params in enumerate(candidates):
+        for f, (train_idx, test_idx) in enumerate(folds):
+            path = os.path.join(cache_dir, _task_key(data_hash, params, f) + ".json")
+            if os.path.exists(path):
+                with open(path) as fh:
+                    scores[c, f] = json.load(fh)
+            else:
+                pending.append((c, f, path, params, train_idx, test_idx))
+
+    print(f"{len(candidates) * len(folds)} évaluations, {len(pending)} à calculer", file=sys.stderr)
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {
+                pool.submit(_evaluate, X, y, params, train_idx, test_idx): (c, f, path)
+                for c, f, path, params, train_idx, test_idx in pending
+            }
+            for future, (c, f, path) in futures.items():
+                scores[c, f] = future.result()
+                # Écriture atomique : une exécution interrompue ne laisse pas de cache corrompu
+                with open(path + ".tmp", "w") as fh:
+                    json.dump(scores[c, f], fh)
+                os.replace(path + ".tmp", path)
+
+    results = []
+    for c, params in enumerate(candidates):
+        fold_scores = [scores[c, f] for f in range(len(folds))]
+        results.append({
+            "params": params,
+            **{f"mean_{m}": float(np.mean([s[m] for s in fold_scores])) for m in SCORING},
+            **{f"std_{m}": float(np.std([s[m] for s in fold_scores])) for m in SCORING},
+        })
+    return results
+
+
+def write_artifacts(pipeline, manifest, models_dir=MODELS_DIR, data=DATA_FILE):
+    import joblib
+
+    out_dir = os.path.join(models_dir, manifest["version"])
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, MODEL_FILE), "wb") as f:
+        pickle.dump(pipeline.named_steps["clf"], f)
+    joblib.dump(pipeline.named_steps["scaler"], os.path.join(out_dir, SCALER_FILE))
+    joblib.dump(pipeline.named_steps["pca"], os.path.join(out_dir, PCA_FILE))
+    # Même version que celle du registre (journal d'audit, /predict), et même
+    # vérification d'exactitude que « compact.py export »
+    version = artifacts_version({name: file_digest(os.path.join(out_dir, name)) for name in ARTIFACT_FILES})
+    artifacts = Artifacts(model=pipeline.named_steps["clf"], scaler=pipeline.named_steps["scaler"],
+                          pca=pipeline.named_steps["pca"], version=version)
+    export_compact(compile_artifacts(artifacts, reference_data=data), os.path.join(out_dir, COMPACT_FILE))
+    # Plages des caractéristiques utilisées par le validateur d'entrées
+    write_feature_stats(os.path.join(out_dir, STATS_FILE), data)
+
+    manifest["model_version"] = version
+    manifest["files"] = {
+        name: file_digest(os.path.join(out_dir, name)) for name in ARTIFACT_FILES + (COMPACT_FILE, STATS_FILE)
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return out_dir
+
+
+def install(out_dir, target_dir=BASE_DIR):
+    """Remplace les artefacts servis ; le registre les rechargera au prochain accès.
+
+    Le manifeste est installé en premier : tant que les .pkl ne correspondent
+    pas tous à ses empreintes, le registre garde l'ancien jeu au lieu de
+    charger un mélange des deux versions.
+    """
+    for name in (MANIFEST_FILE,) + ARTIFACT_FILES + (COMPACT_FILE, STATS_FILE):
+        tmp = os.path.join(target_dir, name + ".tmp")
+        shutil.copyfile(os.path.join(out_dir, name), tmp)
+        os.replace(tmp, os.path.join(target_dir, name))
+
+
+def train(data=DATA_FILE, workers=None, scoring="roc_auc", grid=PARAM_GRID):
+    import sklearn
+
+    X, y = load_dataset(data)
+    data_hash = file_digest(data)
+    candidates = param_candidates(grid)
+
+    start = time.perf_counter()
+    results = cross_validate(X, y, candidates, data_hash, workers)
+    best = max(results, key=lambda r: r[f"mean_{scoring}"])
+    pipeline = make_pipeline(best["params"]).fit(X, y)
+
+    created = time.strftime("%Y%m%d-%H%M%S")
+    manifest = {
+        "version": f"{created}-{data_hash[:8]}",
+        "created": created,
+        "sklearn_version": sklearn.__version__,
+        "numpy_version": np.__version__,
+        "data": {"file": os.path.basename(data), "sha256": data_hash, "rows": int(len(y))},
+        "feature_columns": FEATURE_COLUMNS,
+        "classes": [int(c) for c in pipeline.classes_],
+        "cv": {"n_splits": N_SPLITS, "random_state": RANDOM_STATE, "scoring": scoring},
+        "best": best,
+        "search": results,
+        "search_seconds": time.perf_counter() - start,
+    }
+    return pipeline, manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Réentraîne le scaler, la PCA et le modèle")
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Processus de recherche (défaut : nombre de cœurs)")
+    parser.add_argument("--scoring", choices=SCORING, default="roc_auc")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--install", action="store_true",
+                        help="Copie les nouveaux artefacts à la place de ceux servis par l'application")
+    args = parser.parse_args(argv)
+
+    pipeline, manifest = train(args.data, args.workers, args.scoring)
+    out_dir = write_artifacts(pipeline, manifest, args.models_dir, args.data)
+    best = manifest["best"]
+    print(f"Version {manifest['version']} -> {out_dir}")
+    print(f"Meilleurs paramètres : {best['params']}")
+    print(f"{args.scoring} = {best[f'mean_{args.scoring}']:.4f} ± {best[f'std_{args.scoring}']:.4f} "
+          f"({manifest['search_seconds']:.1f} s)")
+    if args.install:
+        install(out_dir)
+        print("Artefacts installés.")
+
+
+if __name__ == "__main__":
+    main()
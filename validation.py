@@ -0,0 +1,165 @@
+"""Contrôle des entrées à partir des statistiques de wisc_bc_data.csv.
+
+Les statistiques par caractéristique (min, max, quantiles, moyenne, écart type)
+sont calculées une fois et enregistrées dans feature_stats.json, à côté des
+artefacts. Le validateur compare un lot entier aux bornes en quelques
+opérations numpy, avant toute inférence :
+
+- « hors plage » : valeur en dehors du [min, max] observé à l'entraînement,
+  la prédiction reste calculée mais doit être signalée ;
+- « rejetée » : valeur manquante, négative ou au-delà du [min, max] élargi de
+  REJECT_MARGIN fois l'étendue ; la ligne n'est pas envoyée au modèle.
+
+    python validation.py            # régénère feature_stats.json
+"""
+import argparse
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from features import BASE_DIR, DATA_FILE, FEATURE_COLUMNS, N_FEATURES, load_feature_matrix
+
+STATS_FILE = "feature_stats.json"
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+REJECT_MARGIN = float(os.environ.get("PREDCULTURE_REJECT_MARGIN", "1.0"))
+
+OK, OUT_OF_RANGE, REJECTED = 0, 1, 2
+STATUS_LABELS = {OK: "ok", OUT_OF_RANGE: "hors_plage", REJECTED: "rejetee"}
+
+
+def compute_feature_stats(X, source=None):
+    X = np.asarray(X, dtype=np.float64)
+    return {
+        "columns": list(FEATURE_COLUMNS),
+        "rows": int(X.shape[0]),
+        "source": source,
+        "min": X.min(axis=0).tolist(),
+        "max": X.max(axis=0).tolist(),
+        "mean": X.mean(axis=0).tolist(),
+        "std": X.std(axis=0).tolist(),
+        "quantiles": {str(q): np.quantile(X, q, axis=0).tolist() for q in QUANTILES},
+    }
+
+
+def write_feature_stats(path=os.path.join(BASE_DIR, STATS_FILE), data=DATA_FILE):
+    from artifacts import file_digest
+
+    stats = compute_feature_stats(load_feature_matrix(data), source=file_digest(data))
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(stats, f, indent=2)
+    os.replace(tmp, path)
+    return stats
+
+
+def load_feature_stats(path=os.path.join(BASE_DIR, STATS_FILE)):
+    with open(path) as f:
+        stats = json.load(f)
+    if stats["columns"] != list(FEATURE_COLUMNS):
+        raise ValueError(f"{path} ne correspond pas à l'ordre des colonnes du modèle")
+    return stats
+
+
+@dataclass
+class ValidationReport:
+    low: np.ndarray
+    high: np.ndarray
+    invalid: np.ndarray
+    rejected: np.ndarray
+    status: np.ndarray
+
+    @property
+    def accepted(self):
+        return self.status != REJECTED
+
+    @property
+    def n_out_of_range(self):
+        return int(np.count_nonzero(self.status == OUT_OF_RANGE))
+
+    @property
+    def n_rejected(self):
+        return int(np.count_nonzero(self.status == REJECTED))
+
+    def labels(self):
+        return np.array([STATUS_LABELS[s] for s in range(3)], dtype=object).take(self.status)
+
+    def describe(self, row=0):
+        """Colonnes en cause pour une ligne, sous forme de messages lisibles."""
+        messages = []
+        for i in np.flatnonzero(self.low[row] | self.high[row] | self.invalid[row]):
+            if self.invalid[row, i]:
+                reason = "valeur manquante ou négative"
+            elif self.low[row, i]:
+                reason = "inférieure au minimum d'entraînement"
+            else:
+                reason = "supérieure au maximum d'entraînement"
+            if self.rejected[row, i] and not self.invalid[row, i]:
+                reason += ", hors de toute plage plausible"
+            messages.append(f"{FEATURE_COLUMNS[i]} : {reason}")
+        return messages
+
+
+class FeatureValidator:
+    """Bornes par colonne précalculées ; ``validate`` traite un lot (n, 30) d'un coup."""
+
+    def __init__(self, stats, reject_margin=REJECT_MARGIN):
+        self.stats = stats
+        self.lower = np.array(stats["min"], dtype=np.float64)
+        self.upper = np.array(stats["max"], dtype=np.float64)
+        spread = self.upper - self.lower
+        self.reject_lower = np.maximum(self.lower - reject_margin * spread, 0.0)
+        self.reject_upper = self.upper + reject_margin * spread
+
+    def validate(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, N_FEATURES)
+        low = X < self.lower
+        high = X > self.upper
+        # NaN échoue à toutes les comparaisons : il est compté comme invalide
+        invalid = ~(X >= 0)
+        rejected = invalid | (X < self.reject_lower) | (X > self.reject_upper)
+        status = np.where(rejected.any(axis=1), REJECTED, np.where((low | high).any(axis=1), OUT_OF_RANGE, OK))
+        return ValidationReport(low=low, high=high, invalid=invalid, rejected=rejected, status=status.astype(np.int8))
+
+
+_validator = None
+_validator_key = None
+_validator_lock = threading.Lock()
+
+
+def get_validator(path=os.path.join(BASE_DIR, STATS_FILE)):
+    """Validateur partagé par processus, rechargé si feature_stats.json change."""
+    global _validator, _validator_key
+    try:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        key = None
+    if _validator is not None and _validator_key == key:
+        return _validator
+    with _validator_lock:
+        if _validator is None or _validator_key != key:
+            if key is None:
+                # Pas de fichier précalculé : statistiques calculées à la volée
+                stats = compute_feature_stats(load_feature_matrix())
+            else:
+                stats = load_feature_stats(path)
+            _validator = FeatureValidator(stats)
+            _validator_key = key
+    return _validator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Statistiques par caractéristique de wisc_bc_data.csv")
+    parser.add_argument("--data", default=DATA_FILE)
+    parser.add_argument("-o", "--output", default=os.path.join(BASE_DIR, STATS_FILE))
+    args = parser.parse_args(argv)
+
+    stats = write_feature_stats(args.output, args.data)
+    print(f"{stats['rows']} lignes -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()